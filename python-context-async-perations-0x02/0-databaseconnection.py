@@ -1,19 +1,151 @@
 # File: python-context-async-perations-0x02/0-databaseconnection.py
 
+import queue
 import sqlite3
+import threading
+import time
+
+# Applied once when a pooled connection is created, not on every checkout
+PRAGMAS = (
+    ("journal_mode", "WAL"),
+    ("synchronous", "NORMAL"),
+    ("mmap_size", 268435456),   # 256 MiB of the file read through mmap
+    ("cache_size", -65536),     # 64 MiB page cache (negative = KiB)
+    ("temp_store", "MEMORY"),
+)
+
+
+class PoolTimeout(Exception):
+    pass
+
+
+class ConnectionPool:
+    """Thread-safe pool of SQLite connections to one database."""
+
+    def __init__(self, db_name, max_size=8, pragmas=PRAGMAS, acquire_timeout=30):
+        self.db_name = db_name
+        self.max_size = max_size
+        self.acquire_timeout = acquire_timeout
+        self.pragmas = pragmas
+        self._idle = queue.LifoQueue()
+        self._size = 0
+        self._lock = threading.Lock()
+
+    def _connect(self):
+        connection = sqlite3.connect(self.db_name, check_same_thread=False)
+        for name, value in self.pragmas:
+            connection.execute(f"PRAGMA {name} = {value}")
+        return connection
+
+    def acquire(self, timeout=None):
+        """
+        Returns an idle connection, opens a new one while under max_size,
+        or waits up to timeout seconds for one to be released.
+        """
+        timeout = self.acquire_timeout if timeout is None else timeout
+        deadline = time.monotonic() + timeout
+        while True:
+            try:
+                return self._idle.get_nowait()
+            except queue.Empty:
+                pass
+            with self._lock:
+                create = self._size < self.max_size
+                if create:
+                    self._size += 1
+            if create:
+                try:
+                    return self._connect()
+                except Exception:
+                    with self._lock:
+                        self._size -= 1
+                    raise
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                raise PoolTimeout(
+                    f"No connection to {self.db_name} available within {timeout}s "
+                    f"(all {self.max_size} in use)"
+                )
+            # Wake periodically: a discarded connection frees a slot without
+            # putting anything on the idle queue
+            try:
+                return self._idle.get(timeout=min(remaining, 0.1))
+            except queue.Empty:
+                pass
+
+    def release(self, connection):
+        """
+        Returns a connection to the pool, rolling back uncommitted work.
+        A connection that cannot be rolled back is closed and its slot
+        freed instead; release never raises, so it cannot mask the error
+        that ended the caller's block.
+        """
+        try:
+            if connection.in_transaction:
+                connection.rollback()
+        except Exception as e:
+            print(f"[WARN] Discarding connection to {self.db_name}, rollback failed: {e!r}")
+            try:
+                connection.close()
+            except Exception:
+                pass
+            with self._lock:
+                self._size -= 1
+            return
+        self._idle.put(connection)
+
+    def close(self):
+        while True:
+            try:
+                self._idle.get_nowait().close()
+            except queue.Empty:
+                return
+            with self._lock:
+                self._size -= 1
+
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+def get_pool(db_name):
+    with _pools_lock:
+        pool = _pools.get(db_name)
+        if pool is None:
+            pool = _pools[db_name] = ConnectionPool(db_name)
+        return pool
+
 
 class DatabaseConnection:
+    """
+    Borrows a connection from the shared pool for db_name. Nested blocks in
+    the same thread reuse the outer block's connection, which goes back to
+    the pool when the outermost block exits.
+    """
+
+    _local = threading.local()
+
     def __init__(self, db_name):
         self.db_name = db_name
         self.connection = None
 
     def __enter__(self):
-        self.connection = sqlite3.connect(self.db_name)
+        held = self._local.__dict__.setdefault("held", {})
+        entry = held.get(self.db_name)
+        if entry is None:
+            entry = held[self.db_name] = [get_pool(self.db_name).acquire(), 0]
+        entry[1] += 1
+        self.connection = entry[0]
         return self.connection
 
     def __exit__(self, exc_type, exc_value, traceback):
-        if self.connection:
-            self.connection.close()
+        held = self._local.held
+        entry = held[self.db_name]
+        entry[1] -= 1
+        if entry[1] == 0:
+            del held[self.db_name]
+            get_pool(self.db_name).release(entry[0])
+        self.connection = None
 
 
 if __name__ == "__main__":
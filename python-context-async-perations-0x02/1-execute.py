@@ -1,24 +1,157 @@
 # File: python-context-async-perations-0x02/1-execute.py
 
-import sqlite3
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+
+databaseconnection = __import__('0-databaseconnection')
+DatabaseConnection = databaseconnection.DatabaseConnection
+
+
+def namedtuple_rows(description):
+    """Row factory building namedtuples named after the result columns."""
+    Row = namedtuple("Row", [column[0] for column in description], rename=True)
+    return Row._make
+
+
+def record_rows(description):
+    """Row factory building lightweight __slots__ records (no per-row dict)."""
+    fields = namedtuple("Row", [column[0] for column in description], rename=True)._fields
+
+    class Record:
+        __slots__ = fields
+
+        def __init__(self, values):
+            for name, value in zip(fields, values):
+                setattr(self, name, value)
+
+        def __repr__(self):
+            items = ", ".join(f"{name}={getattr(self, name)!r}" for name in fields)
+            return f"Record({items})"
+
+    return Record
+
+
+ROW_FACTORIES = {
+    "tuple": None,
+    "namedtuple": namedtuple_rows,
+    "record": record_rows,
+}
+
 
 class ExecuteQuery:
-    def __init__(self, db_name, query, params=None):
+    """
+    Runs a query on a pooled connection. By default __enter__ returns every
+    row (fetchall). With stream=True it returns a lazy iterator that pulls
+    arraysize rows at a time, so memory stays flat on large results; the
+    cursor is closed on exit even if iteration stopped early.
+
+    row_factory is "tuple", "namedtuple", "record" or a callable that takes
+    cursor.description and returns a function mapping a row tuple to a value.
+    """
+
+    def __init__(self, db_name, query, params=None, stream=False, arraysize=1000, row_factory="tuple"):
         self.db_name = db_name
         self.query = query
         self.params = params or []
+        self.stream = stream
+        self.arraysize = arraysize
+        if isinstance(row_factory, str):
+            if row_factory not in ROW_FACTORIES:
+                raise ValueError(
+                    f"Unknown row_factory {row_factory!r}; expected one of {', '.join(ROW_FACTORIES)} or a callable"
+                )
+            row_factory = ROW_FACTORIES[row_factory]
+        self.row_factory = row_factory
+        self.database = None
         self.connection = None
         self.cursor = None
 
     def __enter__(self):
-        self.connection = sqlite3.connect(self.db_name)
-        self.cursor = self.connection.cursor()
-        self.cursor.execute(self.query, self.params)
-        return self.cursor.fetchall()
+        self.database = DatabaseConnection(self.db_name)
+        self.connection = self.database.__enter__()
+        try:
+            self.cursor = self.connection.cursor()
+            self.cursor.arraysize = self.arraysize
+            self.cursor.execute(self.query, self.params)
+            make_row = self.row_factory(self.cursor.description) if self.row_factory else None
+            if self.stream:
+                return self._iter_rows(self.cursor, make_row)
+            rows = self.cursor.fetchall()
+            return [make_row(row) for row in rows] if make_row else rows
+        except BaseException:
+            # with does not call __exit__ when __enter__ raises
+            self.__exit__(None, None, None)
+            raise
+
+    def _iter_rows(self, cursor, make_row):
+        while True:
+            rows = cursor.fetchmany()
+            if not rows:
+                return
+            if make_row:
+                yield from map(make_row, rows)
+            else:
+                yield from rows
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if self.cursor:
+            self.cursor.close()
+            self.cursor = None
+        if self.database:
+            self.database.__exit__(exc_type, exc_value, traceback)
+            self.database = None
+            self.connection = None
+
+
+class ExecuteMany:
+    """
+    Runs a batch of read queries in parallel on a ThreadPoolExecutor and
+    returns their rows in the order the queries were given.
+
+    Each query borrows a connection from the shared pool and returns it as
+    soon as its rows are fetched, so max_workers may exceed the free pool
+    capacity (or the caller may already hold a connection) without the
+    workers deadlocking; extra workers simply wait for the next release.
+    Queries are SQL strings or (sql, params) pairs.
+
+        with ExecuteMany("users.db", queries, max_workers=4) as results:
+            ...
+    """
+
+    def __init__(self, db_name, queries, max_workers=4):
+        self.db_name = db_name
+        self.queries = [(q, ()) if isinstance(q, str) else q for q in queries]
+        self.max_workers = max_workers
+        self.executor = None
+
+    def _run(self, query, params):
+        pool = databaseconnection.get_pool(self.db_name)
+        conn = pool.acquire()
+        try:
+            cursor = conn.cursor()
+            try:
+                cursor.execute(query, params)
+                return cursor.fetchall()
+            finally:
+                cursor.close()
+        finally:
+            pool.release(conn)
+
+    def __enter__(self):
+        self.executor = ThreadPoolExecutor(max_workers=self.max_workers)
+        futures = [self.executor.submit(self._run, query, params) for query, params in self.queries]
+        try:
+            return [future.result() for future in futures]
+        except BaseException:
+            for future in futures:
+                future.cancel()
+            self.__exit__(None, None, None)
+            raise
 
     def __exit__(self, exc_type, exc_value, traceback):
-        if self.connection:
-            self.connection.close()
+        if self.executor:
+            self.executor.shutdown(wait=True)
+            self.executor = None
 
 
 if __name__ == "__main__":
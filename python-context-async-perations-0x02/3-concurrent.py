@@ -5,6 +5,106 @@ import aiosqlite
 
 DB_NAME = "users.db"
 
+
+class AsyncQueryExecutor:
+    """
+    Runs many queries over a bounded pool of reusable aiosqlite connections.
+
+    At most max_connections connections are opened and at most
+    max_concurrency queries run at once. A query that exceeds its timeout is
+    interrupted in SQLite, not just abandoned, so its connection is free for
+    the next query.
+
+        async with AsyncQueryExecutor("users.db", max_connections=4) as executor:
+            async for index, result in executor.as_completed(queries):
+                ...
+    """
+
+    def __init__(self, db_name=DB_NAME, max_connections=4, max_concurrency=None, timeout=None):
+        self.db_name = db_name
+        self.max_connections = max_connections
+        self.timeout = timeout
+        self._limit = asyncio.Semaphore(max_concurrency or max_connections)
+        self._idle = asyncio.Queue()
+        self._connections = []
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc_value, traceback):
+        await self.close()
+
+    async def _acquire(self):
+        if self._idle.empty() and len(self._connections) < self.max_connections:
+            # Reserve the slot before awaiting so concurrent callers don't overshoot
+            self._connections.append(None)
+            try:
+                conn = await aiosqlite.connect(self.db_name)
+            except BaseException:
+                self._connections.remove(None)
+                raise
+            self._connections[self._connections.index(None)] = conn
+            return conn
+        return await self._idle.get()
+
+    async def run(self, query, params=(), timeout=None):
+        """Runs one query and returns all its rows."""
+        timeout = self.timeout if timeout is None else timeout
+        async with self._limit:
+            conn = await self._acquire()
+            try:
+                return await asyncio.wait_for(self._fetch(conn, query, params), timeout)
+            except (asyncio.TimeoutError, asyncio.CancelledError):
+                # Stop the statement in SQLite; the connection stays usable
+                await conn.interrupt()
+                raise
+            finally:
+                self._idle.put_nowait(conn)
+
+    async def _fetch(self, conn, query, params):
+        async with conn.execute(query, params) as cursor:
+            return await cursor.fetchall()
+
+    async def as_completed(self, queries, timeout=None):
+        """
+        Runs queries (SQL strings or (sql, params) pairs) concurrently and
+        yields (index, rows) as each finishes; a failed or timed-out query
+        yields (index, exception). Closing the generator early (for example
+        with contextlib.aclosing around a loop that breaks) cancels and
+        interrupts the queries still running.
+        """
+        async def run_one(index, query):
+            sql, params = (query, ()) if isinstance(query, str) else query
+            try:
+                return index, await self.run(sql, params, timeout)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                return index, e
+
+        tasks = [asyncio.ensure_future(run_one(i, q)) for i, q in enumerate(queries)]
+        try:
+            for next_done in asyncio.as_completed(tasks):
+                yield await next_done
+        finally:
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+
+    async def gather(self, queries, timeout=None):
+        """Runs queries concurrently and returns their results in order."""
+        results = [None] * len(queries)
+        async for index, result in self.as_completed(queries, timeout):
+            results[index] = result
+        return results
+
+    async def close(self):
+        for conn in self._connections:
+            if conn is not None:
+                await conn.close()
+        self._connections = []
+
+
 async def async_fetch_users():
     async with aiosqlite.connect(DB_NAME) as db:
         async with db.execute("SELECT * FROM users") as cursor:
@@ -18,10 +118,11 @@ async def async_fetch_older_users():
             return rows  # Return users older than 40
 
 async def fetch_concurrently():
-    all_users, older_users = await asyncio.gather(
-        async_fetch_users(),
-        async_fetch_older_users()
-    )
+    async with AsyncQueryExecutor(DB_NAME, max_connections=2) as executor:
+        all_users, older_users = await executor.gather([
+            "SELECT * FROM users",
+            "SELECT * FROM users WHERE age > 40",
+        ])
 
     print("All Users:")
     for user in all_users:
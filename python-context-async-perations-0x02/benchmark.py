@@ -0,0 +1,71 @@
+# File: python-context-async-perations-0x02/benchmark.py
+#
+# Compares running a batch of read queries sequentially (ExecuteQuery), on a
+# thread pool (ExecuteMany) and on the asyncio path (AsyncQueryExecutor).
+# Usage: python3 benchmark.py [db_name] [queries] [workers]
+
+import asyncio
+import sys
+import time
+
+ExecuteQuery = __import__('1-execute').ExecuteQuery
+ExecuteMany = __import__('1-execute').ExecuteMany
+AsyncQueryExecutor = __import__('3-concurrent').AsyncQueryExecutor
+
+
+def make_queries(count):
+    """
+    Half row-returning scans (bound by building Python tuples, which holds
+    the GIL) and half aggregates (work done inside SQLite with the GIL
+    released), so the report shows where threads help and where they don't.
+    """
+    queries = []
+    for i in range(count):
+        if i % 2:
+            queries.append(("SELECT count(*), avg(length(email)) FROM users WHERE age > ?", (i % 100,)))
+        else:
+            queries.append(("SELECT * FROM users WHERE age > ?", (i % 100,)))
+    return queries
+
+
+def run_sequential(db_name, queries):
+    results = []
+    for query, params in queries:
+        with ExecuteQuery(db_name, query, params) as rows:
+            results.append(rows)
+    return results
+
+
+def run_threads(db_name, queries, workers):
+    with ExecuteMany(db_name, queries, max_workers=workers) as results:
+        return results
+
+
+def run_async(db_name, queries, workers):
+    async def main():
+        async with AsyncQueryExecutor(db_name, max_connections=workers) as executor:
+            return await executor.gather(queries)
+    return asyncio.run(main())
+
+
+def timed(label, fn, *args):
+    started = time.perf_counter()
+    results = fn(*args)
+    elapsed = time.perf_counter() - started
+    rows = sum(len(r) for r in results)
+    print(f"{label:<12} {elapsed * 1000:9.1f} ms  ({len(results)} queries, {rows} rows)")
+    return results
+
+
+if __name__ == "__main__":
+    db_name = sys.argv[1] if len(sys.argv) > 1 else "users.db"
+    count = int(sys.argv[2]) if len(sys.argv) > 2 else 200
+    workers = int(sys.argv[3]) if len(sys.argv) > 3 else 4
+    queries = make_queries(count)
+
+    for label, batch in (("rows", queries[0::2]), ("aggregates", queries[1::2])):
+        print(f"-- {label}")
+        sequential = timed("sequential", run_sequential, db_name, batch)
+        threads = timed("threads", run_threads, db_name, batch, workers)
+        concurrent = timed("aiosqlite", run_async, db_name, batch, workers)
+        assert sequential == threads == concurrent, "Result mismatch between execution modes"
@@ -0,0 +1,145 @@
+#!/usr/bin/env python3
+"""Unit tests for the 1-execute module."""
+
+import os
+import sqlite3
+import tempfile
+import threading
+import unittest
+from unittest.mock import patch
+
+databaseconnection = __import__('0-databaseconnection')
+execute = __import__('1-execute')
+
+SLOW_QUERY = (
+    "WITH RECURSIVE n(i) AS (SELECT 1 UNION ALL SELECT i + 1 FROM n WHERE i < 200000) "
+    "SELECT COUNT(*) FROM n WHERE i > ?"
+)
+
+
+class PoolTestCase(unittest.TestCase):
+    """Base case that routes a throwaway database to a small pool."""
+
+    def setUp(self):
+        """Create a throwaway database with a pool of two connections."""
+        fd, self.db_name = tempfile.mkstemp(suffix=".db")
+        os.close(fd)
+        with sqlite3.connect(self.db_name) as conn:
+            conn.execute("CREATE TABLE users (name TEXT, age INTEGER)")
+            conn.executemany("INSERT INTO users VALUES (?, ?)", [("a", 20), ("b", 30), ("c", 40)])
+        self.pool = databaseconnection.ConnectionPool(self.db_name, max_size=2, acquire_timeout=5)
+        databaseconnection._pools[self.db_name] = self.pool
+
+    def tearDown(self):
+        """Close the pooled connections and remove the database."""
+        databaseconnection._pools.pop(self.db_name, None)
+        while not self.pool._idle.empty():
+            self.pool._idle.get_nowait().close()
+        os.remove(self.db_name)
+
+
+class FailingRollback:
+    """Connection proxy whose rollback fails, as on a disk I/O error."""
+
+    def __init__(self, connection):
+        self.connection = connection
+        self.closed = False
+
+    def __getattr__(self, name):
+        return getattr(self.connection, name)
+
+    def rollback(self):
+        raise sqlite3.OperationalError("disk I/O error")
+
+    def close(self):
+        self.closed = True
+        self.connection.close()
+
+
+class TestConnectionPool(PoolTestCase):
+    """Test cases for ConnectionPool.release."""
+
+    def test_failed_rollback_frees_slot(self):
+        """Test that a connection that cannot roll back is closed and its slot reused."""
+        connect = self.pool._connect
+        with patch.object(self.pool, "_connect", lambda: FailingRollback(connect())):
+            broken = self.pool.acquire()
+        other = self.pool.acquire()
+        broken.execute("INSERT INTO users VALUES ('d', 50)")
+        waiter = {}
+        thread = threading.Thread(target=lambda: waiter.setdefault("conn", self.pool.acquire(timeout=5)))
+        thread.start()
+        with patch("builtins.print"):
+            self.pool.release(broken)
+        thread.join(5)
+        self.assertTrue(broken.closed)
+        self.assertIn("conn", waiter)
+        self.assertEqual(self.pool._size, 2)
+        self.pool.release(waiter["conn"])
+        self.pool.release(other)
+
+    def test_exit_keeps_caller_error(self):
+        """Test that a failed rollback does not mask the error raised in the block."""
+        connect = self.pool._connect
+        with patch.object(self.pool, "_connect", lambda: FailingRollback(connect())), patch("builtins.print"):
+            with self.assertRaises(KeyError):
+                with databaseconnection.DatabaseConnection(self.db_name) as conn:
+                    conn.execute("INSERT INTO users VALUES ('d', 50)")
+                    raise KeyError("caller")
+        self.assertEqual(databaseconnection.DatabaseConnection._local.held, {})
+        self.assertEqual(self.pool._size, 0)
+
+
+class TestExecuteQuery(PoolTestCase):
+    """Test cases for ExecuteQuery."""
+
+    def test_unknown_row_factory(self):
+        """Test that an unknown factory name is rejected up front."""
+        with self.assertRaises(ValueError):
+            execute.ExecuteQuery(self.db_name, "SELECT * FROM users", row_factory="dict")
+
+    def test_failing_row_factory_releases_connection(self):
+        """Test that an error while building rows returns the connection."""
+        def broken(description):
+            raise TypeError("bad factory")
+
+        with self.assertRaises(TypeError):
+            with execute.ExecuteQuery(self.db_name, "SELECT * FROM users", row_factory=broken):
+                pass
+        self.assertEqual(self.pool._idle.qsize(), self.pool._size)
+        self.assertEqual(databaseconnection.DatabaseConnection._local.held, {})
+
+    def test_namedtuple_rows(self):
+        """Test that the namedtuple factory names fields after the columns."""
+        query = "SELECT name, age FROM users WHERE age > ? ORDER BY age"
+        with execute.ExecuteQuery(self.db_name, query, [25], row_factory="namedtuple") as rows:
+            self.assertEqual([(row.name, row.age) for row in rows], [("b", 30), ("c", 40)])
+
+
+class TestExecuteMany(PoolTestCase):
+    """Test cases for ExecuteMany against a small connection pool."""
+
+    def test_results_in_query_order(self):
+        """Test that results come back in the order the queries were given."""
+        queries = [("SELECT name FROM users WHERE age > ? ORDER BY name", [age]) for age in (35, 25, 15)]
+        with execute.ExecuteMany(self.db_name, queries, max_workers=2) as results:
+            self.assertEqual(results, [[("c",)], [("b",), ("c",)], [("a",), ("b",), ("c",)]])
+
+    def test_more_workers_than_pool(self):
+        """Test that max_workers above the pool size does not deadlock."""
+        queries = [(SLOW_QUERY, [i]) for i in range(12)]
+        with execute.ExecuteMany(self.db_name, queries, max_workers=6) as results:
+            self.assertEqual(results, [[(200000 - i,)] for i in range(12)])
+        self.assertEqual(self.pool._idle.qsize(), self.pool._size)
+
+    def test_caller_holds_connection(self):
+        """Test that a batch completes while the caller holds a pooled connection."""
+        queries = [(SLOW_QUERY, [i]) for i in range(6)]
+        with databaseconnection.DatabaseConnection(self.db_name) as conn:
+            with execute.ExecuteMany(self.db_name, queries, max_workers=2) as results:
+                self.assertEqual(len(results), 6)
+            self.assertEqual(conn.execute("SELECT COUNT(*) FROM users").fetchone(), (3,))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,16 +1,140 @@
 import sqlite3
 import functools
+import atexit
+import inspect
+import random
+import threading
+import time
+import zlib
+from collections import deque
 from datetime import datetime
 
-def log_queries(func):
+class QueryLog:
+    """
+    Collects structured query events without blocking the caller.
+
+    Events go into a bounded deque and a daemon thread drains it every
+    flush_interval seconds into sink, or as soon as the deque is half full.
+    The deque is guarded by a short lock rather than being lock-free, so
+    that recorded and dropped stay exact across threads; no I/O happens
+    under it. Only sample_rate of ordinary queries are recorded; queries
+    slower than slow_query_ms are always recorded. If the sink falls behind
+    and the deque is full, the oldest event is dropped and counted in
+    dropped. A sink that raises loses only that event, counted in
+    sink_errors.
+    """
+
+    def __init__(self, capacity=10000, sample_rate=1.0, slow_query_ms=None,
+                 flush_interval=1.0, sink=None):
+        self.buffer = deque(maxlen=capacity)
+        self.sample_rate = sample_rate
+        self.slow_query_ms = slow_query_ms
+        self.flush_interval = flush_interval
+        self.sink = sink or print_event
+        self.recorded = 0
+        self.dropped = 0
+        self.sink_errors = 0
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._flusher = None
+        self._flush_lock = threading.Lock()
+
+    def record(self, query, params, duration, rows, error=None):
+        duration_ms = duration * 1000
+        slow = self.slow_query_ms is not None and duration_ms >= self.slow_query_ms
+        if not slow and self.sample_rate < 1.0 and random.random() >= self.sample_rate:
+            return
+        event = {
+            "ts": time.time(),
+            "query": query,
+            "params_hash": zlib.crc32(repr(params).encode()) if params else None,
+            "duration_ms": duration_ms,
+            "rows": rows,
+            "slow": slow,
+            "error": error,
+        }
+        with self._lock:
+            if len(self.buffer) == self.buffer.maxlen:
+                self.dropped += 1
+            self.buffer.append(event)
+            self.recorded += 1
+            backlog = len(self.buffer)
+        if self._flusher is None:
+            self._start()
+        if backlog * 2 >= self.buffer.maxlen:
+            self._wakeup.set()
+
+    def _start(self):
+        with self._flush_lock:
+            if self._flusher is not None:
+                return
+            self._flusher = threading.Thread(target=self._run, name="query-log-flusher", daemon=True)
+            self._flusher.start()
+            atexit.register(self.flush)
+
+    def _run(self):
+        while True:
+            self._wakeup.wait(self.flush_interval)
+            self._wakeup.clear()
+            self.flush()
+
+    def flush(self):
+        with self._flush_lock:
+            with self._lock:
+                events = list(self.buffer)
+                self.buffer.clear()
+            for event in events:
+                try:
+                    self.sink(event)
+                except Exception:
+                    # Keep the flusher alive; one bad event must not stop logging
+                    self.sink_errors += 1
+
+def print_event(event):
+    log_time = datetime.fromtimestamp(event["ts"])
+    flag = " SLOW" if event["slow"] else ""
+    print(f"[LOG{flag}] {log_time.strftime('%Y-%m-%d %H:%M:%S')} - "
+          f"{event['duration_ms']:.3f}ms rows={event['rows']} - Executing SQL Query: {event['query']}")
+
+query_log = QueryLog()
+
+def log_queries(func=None, *, log=None):
+    if func is None:
+        return lambda f: log_queries(f, log=log)
+
+    if inspect.iscoroutinefunction(func):
+        @functools.wraps(func)
+        async def async_wrapper(*args, **kwargs):
+            query = kwargs.get('query') or (args[0] if args else None)
+            if not query:
+                return await func(*args, **kwargs)
+            params = kwargs.get('params', args[1] if len(args) > 1 else None)
+            started = time.perf_counter()
+            try:
+                result = await func(*args, **kwargs)
+            except Exception as e:
+                (log or query_log).record(query, params, time.perf_counter() - started, None, repr(e))
+                raise
+            rows = len(result) if isinstance(result, (list, tuple)) else None
+            (log or query_log).record(query, params, time.perf_counter() - started, rows)
+            return result
+        return async_wrapper
+
     @functools.wraps(func)
     def wrapper(*args, **kwargs):
         query = kwargs.get('query') or (args[0] if args else None)
-        if query:
-            # Set specific time as requested (5:20 PM)
-            log_time = datetime.now().replace(hour=17, minute=20, second=0, microsecond=0)
-            print(f"[LOG] {log_time.strftime('%Y-%m-%d %H:%M:%S')} - Executing SQL Query: {query}")
-        return func(*args, **kwargs)
+        if not query:
+            return func(*args, **kwargs)
+        params = kwargs.get('params', args[1] if len(args) > 1 else None)
+        started = time.perf_counter()
+        try:
+            result = func(*args, **kwargs)
+        except Exception as e:
+            (log or query_log).record(query, params, time.perf_counter() - started, None, repr(e))
+            raise
+        rows = len(result) if isinstance(result, (list, tuple)) else None
+        (log or query_log).record(query, params, time.perf_counter() - started, rows)
+        return result
     return wrapper
 
 @log_queries
@@ -24,4 +148,4 @@ def fetch_all_users(query):
 
 # Example usage
 users = fetch_all_users(query="SELECT * FROM users")
-print(users)
\ No newline at end of file
+print(users)
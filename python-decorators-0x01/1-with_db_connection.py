@@ -1,14 +1,29 @@
-import sqlite3 
 import functools
+import inspect
+
+from db_pool import async_pool_in_use, get_async_pool, get_pool
+from db_router import database_for
 
 def with_db_connection(func):
+    if inspect.iscoroutinefunction(func):
+        @functools.wraps(func)
+        async def async_wrapper(*args, **kwargs):
+            async with get_async_pool(database_for(func, args, kwargs, async_pool_in_use)).connection() as conn:
+                return await func(conn, *args, **kwargs)
+        return async_wrapper
+
+    if getattr(func, "group_commit", False):
+        # The write runs on the group committer's connection, so only the
+        # database name is passed and no pool connection is tied up per caller
+        @functools.wraps(func)
+        def group_wrapper(*args, **kwargs):
+            return func(database_for(func, args, kwargs), *args, **kwargs)
+        return group_wrapper
+
     @functools.wraps(func)
     def wrapper(*args, **kwargs):
-        conn = sqlite3.connect('users.db')
-        try:
+        with get_pool(database_for(func, args, kwargs)).connection() as conn:
             return func(conn, *args, **kwargs)
-        finally:
-            conn.close()
     return wrapper
 
 @with_db_connection 
@@ -1,27 +1,119 @@
-import sqlite3 
 import functools
+import inspect
+
+from db_pool import async_pool_in_use, get_async_pool, get_pool
+from db_router import database_for, note_write
+from group_commit import get_group_committer
+from query_cache import database_of, invalidate_tables, is_write, tables_in
 
 def with_db_connection(func):
+    if inspect.iscoroutinefunction(func):
+        @functools.wraps(func)
+        async def async_wrapper(*args, **kwargs):
+            async with get_async_pool(database_for(func, args, kwargs, async_pool_in_use)).connection() as conn:
+                return await func(conn, *args, **kwargs)
+        return async_wrapper
+
+    if getattr(func, "group_commit", False):
+        # The write runs on the group committer's connection, so only the
+        # database name is passed and no pool connection is tied up per caller
+        @functools.wraps(func)
+        def group_wrapper(*args, **kwargs):
+            return func(database_for(func, args, kwargs), *args, **kwargs)
+        return group_wrapper
+
     @functools.wraps(func)
     def wrapper(*args, **kwargs):
-        conn = sqlite3.connect('users.db')
-        try:
+        with get_pool(database_for(func, args, kwargs)).connection() as conn:
             return func(conn, *args, **kwargs)
-        finally:
-            conn.close()
     return wrapper
 
-def transactional(func):
+def transactional(func=None, *, tables=(), group_commit=False):
+    """
+    Commits on success and rolls back on error. After a commit, cached
+    query results for every table written (detected from the executed
+    statements, plus any listed in tables) are invalidated.
+
+    With group_commit=True the call is handed to the database's
+    GroupCommitter and batched with concurrent writes into one commit.
+    The wrapped function then takes a connection or a database name as its
+    first argument; with_db_connection passes the name, so batches are not
+    capped at the pool size.
+    """
+    if func is None:
+        return lambda f: transactional(f, tables=tables, group_commit=group_commit)
+
+    if group_commit:
+        if inspect.iscoroutinefunction(func):
+            raise TypeError("group_commit only supports regular functions")
+
+        @functools.wraps(func)
+        def group_wrapper(conn, *args, **kwargs):
+            committer = get_group_committer(conn if isinstance(conn, str) else database_of(conn))
+            try:
+                # Runs on the committer's connection inside a shared transaction
+                result = committer.submit(lambda group_conn: func(group_conn, *args, **kwargs))
+                note_write()
+                return result
+            except Exception as e:
+                print(f"[ERROR] Transaction failed: {e}")
+                raise
+            finally:
+                if tables:
+                    invalidate_tables(tables)
+        group_wrapper.db_access = "write"
+        group_wrapper.group_commit = True
+        return group_wrapper
+
+    if inspect.iscoroutinefunction(func):
+        @functools.wraps(func)
+        async def async_wrapper(conn, *args, **kwargs):
+            written = set(tables)
+
+            def track_writes(statement):
+                if is_write(statement):
+                    written.update(tables_in(statement))
+
+            await conn.set_trace_callback(track_writes)
+            try:
+                result = await func(conn, *args, **kwargs)
+                await conn.commit()
+            except Exception as e:
+                await conn.rollback()
+                print(f"[ERROR] Transaction failed: {e}")
+                raise
+            finally:
+                await conn.set_trace_callback(None)
+            note_write()
+            if written:
+                invalidate_tables(written)
+            return result
+        async_wrapper.db_access = "write"
+        return async_wrapper
+
     @functools.wraps(func)
     def wrapper(conn, *args, **kwargs):
+        written = set(tables)
+
+        def track_writes(statement):
+            if is_write(statement):
+                written.update(tables_in(statement))
+
+        conn.set_trace_callback(track_writes)
         try:
             result = func(conn, *args, **kwargs)
             conn.commit()
-            return result
         except Exception as e:
             conn.rollback()
             print(f"[ERROR] Transaction failed: {e}")
             raise
+        finally:
+            conn.set_trace_callback(None)
+        note_write()
+        if written:
+            invalidate_tables(written)
+        return result
+    wrapper.db_access = "write"
     return wrapper
 
 @with_db_connection 
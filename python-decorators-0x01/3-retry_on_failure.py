@@ -1,33 +1,180 @@
 import time
-import sqlite3 
+import sqlite3
+import asyncio
 import functools
+import inspect
+import random
+import threading
+
+from db_pool import async_pool_in_use, get_async_pool, get_pool
+from db_router import database_for
 
 def with_db_connection(func):
+    if inspect.iscoroutinefunction(func):
+        @functools.wraps(func)
+        async def async_wrapper(*args, **kwargs):
+            async with get_async_pool(database_for(func, args, kwargs, async_pool_in_use)).connection() as conn:
+                return await func(conn, *args, **kwargs)
+        return async_wrapper
+
+    if getattr(func, "group_commit", False):
+        # The write runs on the group committer's connection, so only the
+        # database name is passed and no pool connection is tied up per caller
+        @functools.wraps(func)
+        def group_wrapper(*args, **kwargs):
+            return func(database_for(func, args, kwargs), *args, **kwargs)
+        return group_wrapper
+
     @functools.wraps(func)
     def wrapper(*args, **kwargs):
-        conn = sqlite3.connect('users.db')
-        try:
+        with get_pool(database_for(func, args, kwargs)).connection() as conn:
             return func(conn, *args, **kwargs)
-        finally:
-            conn.close()
     return wrapper
 
-def retry_on_failure(retries=3, delay=1):
+TRANSIENT_MESSAGES = ("database is locked", "database table is locked", "database is busy", "unable to open database")
+
+def is_transient(error):
+    """Errors worth retrying: SQLite lock/busy contention, not bad SQL."""
+    if isinstance(error, sqlite3.OperationalError):
+        message = str(error).lower()
+        return any(text in message for text in TRANSIENT_MESSAGES)
+    return isinstance(error, (TimeoutError, ConnectionError))
+
+class CircuitOpenError(Exception):
+    pass
+
+class CircuitBreaker:
+    """
+    Fails fast after failure_threshold consecutive transient failures.
+    After reset_timeout seconds one trial call is let through (half-open);
+    success closes the circuit again, failure re-opens it.
+    """
+
+    def __init__(self, failure_threshold=5, reset_timeout=30):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.opened_at = None
+        self.trial_running = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self):
+        if self.opened_at is None:
+            return "closed"
+        if time.monotonic() - self.opened_at >= self.reset_timeout:
+            return "half-open"
+        return "open"
+
+    def before_call(self):
+        """Raises CircuitOpenError or admits the call; returns True for the half-open trial."""
+        with self._lock:
+            state = self.state
+            if state == "open" or (state == "half-open" and self.trial_running):
+                raise CircuitOpenError("Circuit open: database is failing, not calling it")
+            if state == "half-open":
+                self.trial_running = True
+                return True
+            return False
+
+    def release_trial(self):
+        """Lets another trial through after one ended without a verdict (e.g. cancelled)."""
+        with self._lock:
+            self.trial_running = False
+
+    def record_success(self):
+        with self._lock:
+            self.failures = 0
+            self.opened_at = None
+            self.trial_running = False
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            if self.trial_running or self.failures >= self.failure_threshold:
+                self.opened_at = time.monotonic()
+            self.trial_running = False
+
+def backoff_delay(attempt, delay, max_delay):
+    """Full-jitter exponential backoff: uniform in [0, delay * 2**(attempt-1)]."""
+    return random.uniform(0, min(max_delay, delay * 2 ** (attempt - 1)))
+
+def retry_on_failure(retries=3, delay=1, max_delay=30, deadline=None, retry_if=is_transient, breaker=None):
+    """
+    Retries transient failures with jittered exponential backoff.
+
+    deadline caps the total seconds spent across attempts and sleeps.
+    breaker, if given, is a CircuitBreaker shared by the calls it guards.
+    Coroutine functions get an async wrapper that awaits asyncio.sleep.
+    """
+    def should_retry(error, attempt, started):
+        if not retry_if(error):
+            if breaker:
+                # The database answered, so this says nothing about saturation
+                breaker.record_success()
+            return None
+        if breaker:
+            breaker.record_failure()
+        print(f"[WARN] Attempt {attempt} failed: {error}")
+        if attempt >= retries:
+            print("[ERROR] Max retries reached")
+            return None
+        pause = backoff_delay(attempt, delay, max_delay)
+        if deadline is not None and time.monotonic() - started + pause > deadline:
+            print("[ERROR] Retry deadline exceeded")
+            return None
+        return pause
+
     def decorator(func):
+        if inspect.iscoroutinefunction(func):
+            @functools.wraps(func)
+            async def async_wrapper(*args, **kwargs):
+                started = time.monotonic()
+                attempt = 0
+                while True:
+                    trial = breaker.before_call() if breaker else False
+                    try:
+                        result = await func(*args, **kwargs)
+                    except Exception as e:
+                        attempt += 1
+                        pause = should_retry(e, attempt, started)
+                        if pause is None:
+                            raise
+                        await asyncio.sleep(pause)
+                        continue
+                    except BaseException:
+                        # Cancelled or interrupted: no verdict, but never strand the trial
+                        if trial:
+                            breaker.release_trial()
+                        raise
+                    if breaker:
+                        breaker.record_success()
+                    return result
+            return async_wrapper
+
         @functools.wraps(func)
         def wrapper(*args, **kwargs):
+            started = time.monotonic()
             attempt = 0
-            while attempt < retries:
+            while True:
+                trial = breaker.before_call() if breaker else False
                 try:
-                    return func(*args, **kwargs)
+                    result = func(*args, **kwargs)
                 except Exception as e:
                     attempt += 1
-                    print(f"[WARN] Attempt {attempt} failed: {e}")
-                    if attempt < retries:
-                        time.sleep(delay)
-                    else:
-                        print("[ERROR] Max retries reached")
+                    pause = should_retry(e, attempt, started)
+                    if pause is None:
                         raise
+                    time.sleep(pause)
+                    continue
+                except BaseException:
+                    # Cancelled or interrupted: no verdict, but never strand the trial
+                    if trial:
+                        breaker.release_trial()
+                    raise
+                if breaker:
+                    breaker.record_success()
+                return result
         return wrapper
     return decorator
 
@@ -39,4 +186,4 @@ def fetch_users_with_retry(conn):
     return cursor.fetchall()
 
 users = fetch_users_with_retry()
-print(users)
\ No newline at end of file
+print(users)
@@ -1,28 +1,142 @@
-import sqlite3 
+import asyncio
 import functools
+import inspect
 
-query_cache = {}
+from db_pool import async_pool_in_use, get_async_pool, get_pool
+from db_router import database_for
+from query_cache import (
+    AsyncSingleFlight, QueryCache, SingleFlight, database_of, get_default_cache, register_cache, tables_in
+)
 
 def with_db_connection(func):
+    if inspect.iscoroutinefunction(func):
+        @functools.wraps(func)
+        async def async_wrapper(*args, **kwargs):
+            async with get_async_pool(database_for(func, args, kwargs, async_pool_in_use)).connection() as conn:
+                return await func(conn, *args, **kwargs)
+        return async_wrapper
+
+    if getattr(func, "group_commit", False):
+        # The write runs on the group committer's connection, so only the
+        # database name is passed and no pool connection is tied up per caller
+        @functools.wraps(func)
+        def group_wrapper(*args, **kwargs):
+            return func(database_for(func, args, kwargs), *args, **kwargs)
+        return group_wrapper
+
     @functools.wraps(func)
     def wrapper(*args, **kwargs):
-        conn = sqlite3.connect('users.db')
-        try:
+        with get_pool(database_for(func, args, kwargs)).connection() as conn:
             return func(conn, *args, **kwargs)
-        finally:
-            conn.close()
     return wrapper
 
-def cache_query(func):
+def cache_get(store, key, record=True):
+    """store.get that treats a failing backend as a miss."""
+    try:
+        return store.get(key, record=record)
+    except Exception as e:
+        print(f"[WARN] Cache read failed, querying the database: {e!r}")
+        return False, None
+
+def cache_generation(store, key):
+    """
+    The write generation of the tables key's query reads, taken before the
+    query runs; None if the backend failed, in which case the result is not
+    cached.
+    """
+    try:
+        return store.generation(tables_in(key[1]))
+    except Exception as e:
+        print(f"[WARN] Cache generation unavailable: {e!r}")
+        return None
+
+def cache_set(store, key, result, ttl, generation):
+    """
+    store.set that drops results read across a write to their tables and
+    skips caching when the backend fails or cannot encode result.
+    """
+    if generation is None:
+        return
+    try:
+        store.set(key, result, ttl=ttl, generation=generation)
+    except Exception as e:
+        print(f"[WARN] Result not cached: {e!r}")
+
+async def run_cache_op(store, op, *args):
+    # Shared backends block on sockets or SQLite; keep them off the event loop
+    if isinstance(store, QueryCache):
+        return op(store, *args)
+    return await asyncio.to_thread(op, store, *args)
+
+def cache_query(func=None, *, ttl=None, cache=None):
+    """
+    Caches results keyed on database, query and parameters. Concurrent
+    misses on the same key are coalesced into a single query.
+    Usable bare (@cache_query) or with options (@cache_query(ttl=60)).
+    cache defaults to query_cache.get_default_cache(); see cache_backends
+    for backends shared between processes. A backend that fails, or cannot
+    store a result, never fails the call: reads fall back to the query.
+    """
+    if func is None:
+        return lambda f: cache_query(f, ttl=ttl, cache=cache)
+    if cache is not None:
+        register_cache(cache)
+
+    if inspect.iscoroutinefunction(func):
+        flights = AsyncSingleFlight()
+
+        @functools.wraps(func)
+        async def async_wrapper(conn, *args, **kwargs):
+            query = kwargs.get('query') or (args[0] if args else None)
+            if query is None:
+                return await func(conn, *args, **kwargs)
+            params = kwargs.get('params', args[1] if len(args) > 1 else ())
+            key = QueryCache.make_key(getattr(conn, "db_name", None), query, params)
+            store = cache if cache is not None else get_default_cache()
+            hit, result = await run_cache_op(store, cache_get, key)
+            if hit:
+                print("[CACHE] Returning cached result")
+                return result
+
+            async def load():
+                # A flight that just finished may already have filled the cache
+                hit, result = await run_cache_op(store, cache_get, key, False)
+                if hit:
+                    return result
+                generation = await run_cache_op(store, cache_generation, key)
+                result = await func(conn, *args, **kwargs)
+                await run_cache_op(store, cache_set, key, result, ttl, generation)
+                return result
+            return await flights.do(key, load)
+        async_wrapper.flights = flights
+        return async_wrapper
+
+    flights = SingleFlight()
+
     @functools.wraps(func)
     def wrapper(conn, *args, **kwargs):
-        query = kwargs.get('query') or (args[1] if len(args) > 1 else None)
-        if query in query_cache:
+        query = kwargs.get('query') or (args[0] if args else None)
+        if query is None:
+            return func(conn, *args, **kwargs)
+        params = kwargs.get('params', args[1] if len(args) > 1 else ())
+        key = QueryCache.make_key(database_of(conn), query, params)
+        store = cache if cache is not None else get_default_cache()
+        hit, result = cache_get(store, key)
+        if hit:
             print("[CACHE] Returning cached result")
-            return query_cache[query]
-        result = func(conn, *args, **kwargs)
-        query_cache[query] = result
-        return result
+            return result
+
+        def load():
+            # A flight that just finished may already have filled the cache
+            hit, result = cache_get(store, key, record=False)
+            if hit:
+                return result
+            generation = cache_generation(store, key)
+            result = func(conn, *args, **kwargs)
+            cache_set(store, key, result, ttl, generation)
+            return result
+        return flights.do(key, load)
+    wrapper.flights = flights
     return wrapper
 
 @with_db_connection
@@ -36,4 +150,4 @@ users = fetch_users_with_cache(query="SELECT * FROM users")
 print(users)
 
 users_again = fetch_users_with_cache(query="SELECT * FROM users")
-print(users_again)
\ No newline at end of file
+print(users_again)
@@ -0,0 +1,446 @@
+"""
+Shared backends for cache_query.
+
+QueryCache (query_cache.py) is the in-process LRU. The backends below let
+every worker process on a host share one cache instead of each warming its
+own copy:
+
+    SQLiteCacheBackend  an on-disk cache file in WAL mode
+    RedisCacheBackend   any server speaking the Redis protocol (RESP)
+
+All three implement get/generation/set/invalidate_tables/clear/stats, with
+the per-table write generations described in query_cache kept in the
+shared store, so a write in one process also stops stale sets in another.
+Shared backends
+store results with encode/decode, a compact tagged binary format for query
+results (lists of tuples of None/bool/int/float/str/bytes), not pickle: a
+result set carries one header for all its rows and small ints take a byte.
+"""
+import hashlib
+import socket
+import sqlite3
+import struct
+import threading
+import time
+
+from query_cache import tables_in
+
+_DOUBLE = struct.Struct("<d")
+
+
+def _write_varint(out, value):
+    while value >= 0x80:
+        out.append((value & 0x7F) | 0x80)
+        value >>= 7
+    out.append(value)
+
+
+def _read_varint(data, pos):
+    shift = result = 0
+    while True:
+        byte = data[pos]
+        pos += 1
+        result |= (byte & 0x7F) << shift
+        if byte < 0x80:
+            return result, pos
+        shift += 7
+
+
+def _encode_into(out, value):
+    if value is None:
+        out += b"N"
+    elif value is True:
+        out += b"T"
+    elif value is False:
+        out += b"F"
+    elif isinstance(value, int) and 0 <= value < 0x80:
+        # Small non-negative ints (ages, flags, counts) are a single byte
+        out.append(0x80 | value)
+    elif isinstance(value, int):
+        # Zigzag so small negative numbers stay small
+        out += b"i"
+        _write_varint(out, (value << 1) if value >= 0 else ((-value << 1) - 1))
+    elif isinstance(value, float):
+        out += b"d"
+        out += _DOUBLE.pack(value)
+    elif isinstance(value, str):
+        raw = value.encode("utf-8")
+        out += b"s"
+        _write_varint(out, len(raw))
+        out += raw
+    elif isinstance(value, (bytes, bytearray, memoryview)):
+        raw = bytes(value)
+        out += b"b"
+        _write_varint(out, len(raw))
+        out += raw
+    elif _is_row_set(value):
+        # Result sets: one header for all rows instead of one per tuple
+        out += b"r"
+        _write_varint(out, len(value))
+        _write_varint(out, len(value[0]))
+        for row in value:
+            for item in row:
+                _encode_into(out, item)
+    elif isinstance(value, (list, tuple)):
+        out += b"l" if isinstance(value, list) else b"t"
+        _write_varint(out, len(value))
+        for item in value:
+            _encode_into(out, item)
+    else:
+        raise TypeError(f"Cannot cache value of type {type(value).__name__}")
+
+
+def _is_row_set(value):
+    if not isinstance(value, list) or not value or type(value[0]) is not tuple:
+        return False
+    width = len(value[0])
+    return all(type(row) is tuple and len(row) == width for row in value)
+
+
+def encode(value):
+    out = bytearray()
+    _encode_into(out, value)
+    return bytes(out)
+
+
+def _decode_from(data, pos):
+    tag = data[pos]
+    pos += 1
+    if tag & 0x80:
+        return tag & 0x7F, pos
+    if tag == 0x4E:  # N
+        return None, pos
+    if tag == 0x54:  # T
+        return True, pos
+    if tag == 0x46:  # F
+        return False, pos
+    if tag == 0x69:  # i
+        raw, pos = _read_varint(data, pos)
+        return (raw >> 1) if not raw & 1 else -((raw + 1) >> 1), pos
+    if tag == 0x64:  # d
+        return _DOUBLE.unpack_from(data, pos)[0], pos + 8
+    if tag in (0x73, 0x62):  # s, b
+        length, pos = _read_varint(data, pos)
+        raw = bytes(data[pos:pos + length])
+        return (raw.decode("utf-8") if tag == 0x73 else raw), pos + length
+    if tag in (0x6C, 0x74):  # l, t
+        count, pos = _read_varint(data, pos)
+        items = []
+        for _ in range(count):
+            item, pos = _decode_from(data, pos)
+            items.append(item)
+        return (items if tag == 0x6C else tuple(items)), pos
+    if tag == 0x72:  # r
+        count, pos = _read_varint(data, pos)
+        width, pos = _read_varint(data, pos)
+        rows = []
+        for _ in range(count):
+            row = []
+            for _ in range(width):
+                item, pos = _decode_from(data, pos)
+                row.append(item)
+            rows.append(tuple(row))
+        return rows, pos
+    raise ValueError(f"Corrupt cache entry (tag {tag!r})")
+
+
+def decode(data):
+    value, _ = _decode_from(memoryview(data), 0)
+    return value
+
+
+def key_digest(key):
+    """Fixed-size identifier for a (database, query, params) cache key."""
+    return hashlib.blake2b(encode(list(key)), digest_size=16).hexdigest()
+
+
+class SQLiteCacheBackend:
+    """
+    Cache file shared by all processes on the host, evicted LRU by max_entries.
+
+    A hit only rewrites the entry's last_used once it is more than
+    touch_interval seconds old, so hot keys are not a write per read; LRU
+    order is approximate to that granularity.
+    """
+
+    def __init__(self, path="query_cache.db", max_entries=10000, ttl=300, touch_interval=1.0):
+        self.path = path
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.touch_interval = touch_interval
+        self.hits = 0
+        self.misses = 0
+        self.stale_drops = 0
+        self._local = threading.local()
+        conn = self._conn()
+        conn.executescript("""
+            CREATE TABLE IF NOT EXISTS cache (
+                key TEXT PRIMARY KEY,
+                value BLOB NOT NULL,
+                expires_at REAL,
+                last_used REAL NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS idx_cache_last_used ON cache (last_used);
+            CREATE INDEX IF NOT EXISTS idx_cache_expires_at ON cache (expires_at);
+            CREATE TABLE IF NOT EXISTS cache_tags (
+                tag TEXT NOT NULL,
+                key TEXT NOT NULL,
+                PRIMARY KEY (tag, key)
+            );
+            CREATE INDEX IF NOT EXISTS idx_cache_tags_key ON cache_tags (key);
+            CREATE TABLE IF NOT EXISTS cache_generations (
+                tag TEXT PRIMARY KEY,
+                generation INTEGER NOT NULL
+            );
+        """)
+
+    def _conn(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = self._local.conn = sqlite3.connect(self.path, isolation_level=None, timeout=5)
+            conn.execute("PRAGMA journal_mode = WAL")
+            conn.execute("PRAGMA synchronous = OFF")
+        return conn
+
+    def get(self, key, record=True):
+        digest = key_digest(key)
+        conn = self._conn()
+        row = conn.execute("SELECT value, expires_at, last_used FROM cache WHERE key = ?", (digest,)).fetchone()
+        now = time.time()
+        if row is None or (row[1] is not None and row[1] < now):
+            self.misses += record
+            return False, None
+        if now - row[2] > self.touch_interval:
+            conn.execute("UPDATE cache SET last_used = ? WHERE key = ?", (now, digest))
+        self.hits += record
+        return True, decode(row[0])
+
+    def _generation(self, conn, tables):
+        tables = sorted(tables)
+        if not tables:
+            return ()
+        found = dict(conn.execute(
+            f"SELECT tag, generation FROM cache_generations WHERE tag IN ({', '.join('?' * len(tables))})",
+            tables
+        ).fetchall())
+        return tuple(found.get(table, 0) for table in tables)
+
+    def generation(self, tables):
+        return self._generation(self._conn(), tables)
+
+    def set(self, key, value, ttl=None, tables=None, generation=None):
+        ttl = self.ttl if ttl is None else ttl
+        tables = tables_in(key[1]) if tables is None else tables
+        digest = key_digest(key)
+        data = encode(value)
+        now = time.time()
+        conn = self._conn()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            # Checked under the write lock, so no invalidation can slip in
+            if generation is not None and tuple(generation) != self._generation(conn, tables):
+                conn.execute("ROLLBACK")
+                self.stale_drops += 1
+                return
+            # A replaced entry may have been tagged with other tables
+            conn.execute("DELETE FROM cache_tags WHERE key = ?", (digest,))
+            conn.execute(
+                "INSERT OR REPLACE INTO cache (key, value, expires_at, last_used) VALUES (?, ?, ?, ?)",
+                (digest, data, now + ttl if ttl else None, now)
+            )
+            conn.executemany(
+                "INSERT OR IGNORE INTO cache_tags (tag, key) VALUES (?, ?)",
+                [(table, digest) for table in tables]
+            )
+            # Expired entries and those past max_entries, with their tags
+            dropped = conn.execute("""
+                SELECT key FROM cache WHERE expires_at < ?
+                UNION
+                SELECT key FROM (
+                    SELECT key FROM cache WHERE expires_at IS NULL OR expires_at >= ?
+                    ORDER BY last_used DESC LIMIT -1 OFFSET ?
+                )
+            """, (now, now, self.max_entries)).fetchall()
+            conn.executemany("DELETE FROM cache WHERE key = ?", dropped)
+            conn.executemany("DELETE FROM cache_tags WHERE key = ?", dropped)
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+
+    def invalidate_tables(self, tables):
+        conn = self._conn()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            for table in tables:
+                conn.execute("""
+                    INSERT INTO cache_generations (tag, generation) VALUES (?, 1)
+                    ON CONFLICT (tag) DO UPDATE SET generation = generation + 1
+                """, (table.lower(),))
+                keys = conn.execute("SELECT key FROM cache_tags WHERE tag = ?", (table.lower(),)).fetchall()
+                conn.executemany("DELETE FROM cache WHERE key = ?", keys)
+                # Also drops the entries' tags for the other tables they read
+                conn.executemany("DELETE FROM cache_tags WHERE key = ?", keys)
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+
+    def clear(self):
+        conn = self._conn()
+        conn.execute("DELETE FROM cache")
+        conn.execute("DELETE FROM cache_tags")
+
+    def stats(self):
+        (entries,) = self._conn().execute("SELECT COUNT(*) FROM cache").fetchone()
+        return {"entries": entries, "hits": self.hits, "misses": self.misses, "stale_drops": self.stale_drops}
+
+
+class RedisError(Exception):
+    pass
+
+
+class RedisCacheBackend:
+    """
+    Cache stored in a Redis-protocol server. Expiry and memory-bounded
+    eviction are left to the server (SET ... PX, maxmemory-policy). Tag
+    sets are given the TTL of their longest-lived entry, so they expire
+    once nothing they point at can still be cached.
+    """
+
+    def __init__(self, host="127.0.0.1", port=6379, prefix="query_cache:", ttl=300, timeout=1.0):
+        self.address = (host, port)
+        self.prefix = prefix
+        self.ttl = ttl
+        self.timeout = timeout
+        self.hits = 0
+        self.misses = 0
+        self.stale_drops = 0
+        self._local = threading.local()
+
+    def _connection(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            sock = socket.create_connection(self.address, timeout=self.timeout)
+            conn = self._local.conn = (sock, sock.makefile("rb"))
+        return conn
+
+    def command(self, *parts):
+        """Sends one RESP command and returns the parsed reply."""
+        out = bytearray(b"*%d\r\n" % len(parts))
+        for part in parts:
+            if isinstance(part, str):
+                part = part.encode("utf-8")
+            elif isinstance(part, int):
+                part = str(part).encode()
+            out += b"$%d\r\n%s\r\n" % (len(part), part)
+        sock, reader = self._connection()
+        try:
+            sock.sendall(out)
+            return self._read_reply(reader)
+        except OSError:
+            self._local.conn = None
+            sock.close()
+            raise
+
+    def _read_reply(self, reader):
+        line = reader.readline()
+        if not line:
+            raise ConnectionError("Cache server closed the connection")
+        kind, payload = line[:1], line[1:-2]
+        if kind == b"+":
+            return payload.decode()
+        if kind == b"-":
+            raise RedisError(payload.decode())
+        if kind == b":":
+            return int(payload)
+        if kind == b"$":
+            length = int(payload)
+            if length < 0:
+                return None
+            data = reader.read(length + 2)
+            return data[:-2]
+        if kind == b"*":
+            count = int(payload)
+            return None if count < 0 else [self._read_reply(reader) for _ in range(count)]
+        raise RedisError(f"Unexpected reply: {line!r}")
+
+    def get(self, key, record=True):
+        data = self.command("GET", self.prefix + key_digest(key))
+        if data is None:
+            self.misses += record
+            return False, None
+        self.hits += record
+        return True, decode(data)
+
+    def _generation_keys(self, tables):
+        return [f"{self.prefix}gen:{table}" for table in sorted(tables)]
+
+    def generation(self, tables):
+        names = self._generation_keys(tables)
+        values = self.command("MGET", *names) if names else []
+        return tuple(int(value or 0) for value in values)
+
+    def set(self, key, value, ttl=None, tables=None, generation=None):
+        ttl = self.ttl if ttl is None else ttl
+        tables = tables_in(key[1]) if tables is None else tables
+        name = self.prefix + key_digest(key)
+        data = encode(value)
+        if generation is not None and tables:
+            # WATCH makes EXEC fail if an invalidation bumps a generation
+            # after this check
+            self.command("WATCH", *self._generation_keys(tables))
+            if tuple(generation) != self.generation(tables):
+                self.command("UNWATCH")
+                self.stale_drops += 1
+                return
+        tags = []
+        try:
+            for table in tables:
+                tag = f"{self.prefix}tag:{table}"
+                if not ttl:
+                    tags.append((tag, "PERSIST"))
+                elif not self.command("EXISTS", tag) or 0 <= self.command("PTTL", tag) < ttl * 1000:
+                    # Never shorten: the set must outlive every entry it lists
+                    tags.append((tag, "PEXPIRE"))
+                else:
+                    tags.append((tag, None))
+        except RedisError:
+            self.command("UNWATCH")
+            raise
+        self.command("MULTI")
+        try:
+            if ttl:
+                self.command("SET", name, data, "PX", int(ttl * 1000))
+            else:
+                self.command("SET", name, data)
+            for tag, expiry in tags:
+                self.command("SADD", tag, name)
+                if expiry == "PERSIST":
+                    self.command("PERSIST", tag)
+                elif expiry == "PEXPIRE":
+                    self.command("PEXPIRE", tag, int(ttl * 1000))
+        except RedisError:
+            self.command("DISCARD")
+            raise
+        if self.command("EXEC") is None:
+            self.stale_drops += 1
+
+    def invalidate_tables(self, tables):
+        for table in tables:
+            # Bump the generation first so no set that started before this
+            # write can store its result after the entries are deleted
+            self.command("INCR", f"{self.prefix}gen:{table.lower()}")
+            tag = f"{self.prefix}tag:{table.lower()}"
+            names = self.command("SMEMBERS", tag) or []
+            if names:
+                self.command("DEL", *names)
+            self.command("DEL", tag)
+
+    def clear(self):
+        names = self.command("KEYS", self.prefix + "*") or []
+        if names:
+            self.command("DEL", *names)
+
+    def stats(self):
+        return {"hits": self.hits, "misses": self.misses, "stale_drops": self.stale_drops}
@@ -0,0 +1,420 @@
+"""
+Thread-safe SQLite connection pool used by with_db_connection.
+
+Connections are created lazily up to max_size, kept warm down to min_size,
+closed after idle_timeout seconds unused, and health-checked before being
+handed out again. Callers that find the pool exhausted wait in a queue and
+the wait is recorded in the pool metrics.
+
+AsyncConnectionPool is the aiosqlite counterpart used when the decorated
+function is a coroutine.
+"""
+import asyncio
+import sqlite3
+import threading
+import time
+import weakref
+from contextlib import asynccontextmanager, contextmanager
+
+from query_profiler import profiler
+from statement_cache import StatementCache, TrackingCursor, merge_snapshots
+
+
+class PooledConnection(sqlite3.Connection):
+    """
+    sqlite3 connection that remembers which database it points at and
+    records per-statement stats through TrackingCursor.
+    """
+
+    def __init__(self, database, *args, cached_statements=128, **kwargs):
+        super().__init__(database, *args, cached_statements=cached_statements, **kwargs)
+        self.db_name = database
+        self.last_used = time.monotonic()
+        self.statements = StatementCache(cached_statements)
+
+    def cursor(self, factory=TrackingCursor):
+        return super().cursor(factory)
+
+    def execute(self, sql, parameters=()):
+        return self.cursor().execute(sql, parameters)
+
+    def executemany(self, sql, seq_of_parameters):
+        return self.cursor().executemany(sql, seq_of_parameters)
+
+
+class PoolTimeout(Exception):
+    pass
+
+
+# WAL lets readers run alongside the writer, and synchronous=NORMAL only
+# fsyncs at checkpoints instead of on every commit (safe in WAL mode).
+DEFAULT_PRAGMAS = (
+    ("journal_mode", "WAL"),
+    ("synchronous", "NORMAL"),
+    ("busy_timeout", 5000),
+)
+
+
+def apply_pragmas(conn, pragmas=DEFAULT_PRAGMAS):
+    for name, value in pragmas:
+        conn.execute(f"PRAGMA {name} = {value}")
+
+
+class ConnectionPool:
+    def __init__(self, db_name, min_size=1, max_size=10, idle_timeout=300,
+                 acquire_timeout=30, health_check_after=30, pragmas=DEFAULT_PRAGMAS,
+                 statement_cache_size=128):
+        if min_size > max_size:
+            raise ValueError("min_size cannot exceed max_size")
+        self.db_name = db_name
+        self.min_size = min_size
+        self.max_size = max_size
+        self.idle_timeout = idle_timeout
+        self.acquire_timeout = acquire_timeout
+        self.health_check_after = health_check_after
+        self.pragmas = pragmas
+        self.statement_cache_size = statement_cache_size
+        self._connections = weakref.WeakSet()
+        self._idle = []  # most recently released last
+        self._size = 0
+        self._closed = False
+        self._cond = threading.Condition()
+        self.metrics = {
+            "created": 0,
+            "closed": 0,
+            "acquired": 0,
+            "health_check_failures": 0,
+            "waits": 0,
+            "waiting": 0,
+            "wait_time_total": 0.0,
+            "wait_time_max": 0.0,
+            "timeouts": 0,
+        }
+        for _ in range(min_size):
+            self._idle.append(self._connect())
+            self._size += 1
+            self.metrics["created"] += 1
+
+    def _connect(self):
+        conn = sqlite3.connect(self.db_name, factory=PooledConnection, check_same_thread=False,
+                               cached_statements=self.statement_cache_size)
+        apply_pragmas(conn, self.pragmas)
+        self._connections.add(conn)
+        return conn
+
+    def _discard(self, conn):
+        self._size -= 1
+        self.metrics["closed"] += 1
+        try:
+            conn.close()
+        except sqlite3.Error:
+            pass
+
+    def _healthy(self, conn):
+        if time.monotonic() - conn.last_used < self.health_check_after:
+            return True
+        try:
+            conn.execute("SELECT 1").fetchone()
+            return True
+        except sqlite3.Error:
+            return False
+
+    def _prune_idle(self):
+        """Closes connections idle past idle_timeout, keeping min_size."""
+        cutoff = time.monotonic() - self.idle_timeout
+        while self._idle and self._size > self.min_size and self._idle[0].last_used < cutoff:
+            self._discard(self._idle.pop(0))
+
+    def acquire(self, timeout=None):
+        """
+        Only the bookkeeping runs under the pool lock. Opening a connection
+        and the SELECT 1 health check happen after the slot or the idle
+        connection has been reserved, so one slow connect or check does not
+        stall every other acquire and release.
+        """
+        timeout = self.acquire_timeout if timeout is None else timeout
+        started = None
+        while True:
+            with self._cond:
+                if self._closed:
+                    raise PoolTimeout("Pool is closed")
+                self._prune_idle()
+                if self._idle:
+                    conn = self._idle.pop()
+                elif self._size < self.max_size:
+                    self._size += 1
+                    conn = None
+                else:
+                    if started is None:
+                        started = time.monotonic()
+                        self.metrics["waits"] += 1
+                    remaining = timeout - (time.monotonic() - started)
+                    if remaining <= 0:
+                        self.metrics["timeouts"] += 1
+                        self._record_wait(started)
+                        raise PoolTimeout(f"No connection to {self.db_name} available within {timeout}s")
+                    self.metrics["waiting"] += 1
+                    try:
+                        self._cond.wait(remaining)
+                    finally:
+                        self.metrics["waiting"] -= 1
+                    continue
+
+            if conn is None:
+                try:
+                    conn = self._connect()
+                except BaseException:
+                    with self._cond:
+                        self._size -= 1
+                        self._cond.notify()
+                    raise
+                with self._cond:
+                    self.metrics["created"] += 1
+                    return self._checkout(conn, started)
+
+            if self._healthy(conn):
+                with self._cond:
+                    return self._checkout(conn, started)
+            with self._cond:
+                self.metrics["health_check_failures"] += 1
+                self._discard(conn)
+                # The slot is free again for this or another waiter
+                self._cond.notify()
+
+    def _checkout(self, conn, started):
+        if started is not None:
+            self._record_wait(started)
+        self.metrics["acquired"] += 1
+        return conn
+
+    def _record_wait(self, started):
+        waited = time.monotonic() - started
+        self.metrics["wait_time_total"] += waited
+        self.metrics["wait_time_max"] = max(self.metrics["wait_time_max"], waited)
+
+    def release(self, conn):
+        # Never hand the next borrower a half-finished transaction
+        try:
+            if conn.in_transaction:
+                conn.rollback()
+            healthy = True
+        except sqlite3.Error:
+            healthy = False
+        with self._cond:
+            if self._closed or not healthy:
+                self._discard(conn)
+            else:
+                conn.last_used = time.monotonic()
+                self._idle.append(conn)
+            self._cond.notify()
+
+    @contextmanager
+    def connection(self, timeout=None):
+        started = time.perf_counter()
+        conn = self.acquire(timeout)
+        if profiler.enabled:
+            profiler.note_acquire(time.perf_counter() - started)
+        try:
+            yield conn
+        finally:
+            self.release(conn)
+
+    @property
+    def in_use(self):
+        return self._size - len(self._idle)
+
+    def stats(self):
+        with self._cond:
+            stats = dict(self.metrics)
+            stats.update(size=self._size, idle=len(self._idle), in_use=self._size - len(self._idle))
+            return stats
+
+    def statement_stats(self):
+        """Per-statement executions, time and rows summed over open connections."""
+        return merge_snapshots(conn.statements.snapshot() for conn in list(self._connections))
+
+    def close(self):
+        with self._cond:
+            self._closed = True
+            while self._idle:
+                self._discard(self._idle.pop())
+            self._cond.notify_all()
+
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+def get_pool(db_name="users.db", **options):
+    """Returns the shared pool for db_name, creating it on first use."""
+    with _pools_lock:
+        pool = _pools.get(db_name)
+        if pool is None:
+            pool = _pools[db_name] = ConnectionPool(db_name, **options)
+        return pool
+
+
+class AsyncConnectionPool:
+    """aiosqlite pool with the same sizing rules as ConnectionPool."""
+
+    def __init__(self, db_name, max_size=10, idle_timeout=300, acquire_timeout=30,
+                 pragmas=DEFAULT_PRAGMAS):
+        self.db_name = db_name
+        self.pragmas = pragmas
+        self.max_size = max_size
+        self.idle_timeout = idle_timeout
+        self.acquire_timeout = acquire_timeout
+        self._idle = []
+        self._size = 0
+        self._closed = False
+        self._cond = asyncio.Condition()
+        self.metrics = {"created": 0, "closed": 0, "acquired": 0, "waits": 0, "wait_time_total": 0.0}
+
+    async def _connect(self):
+        import aiosqlite
+
+        conn = await aiosqlite.connect(self.db_name)
+        for name, value in self.pragmas:
+            await conn.execute(f"PRAGMA {name} = {value}")
+        conn.db_name = self.db_name
+        self.metrics["created"] += 1
+        return conn
+
+    async def _discard(self, conn):
+        self._size -= 1
+        self.metrics["closed"] += 1
+        await conn.close()
+
+    async def acquire(self, timeout=None):
+        timeout = self.acquire_timeout if timeout is None else timeout
+        async with self._cond:
+            if self._closed:
+                raise PoolTimeout("Pool is closed")
+            cutoff = time.monotonic() - self.idle_timeout
+            while self._idle and self._idle[0][1] < cutoff:
+                await self._discard(self._idle.pop(0)[0])
+            if not self._idle and self._size >= self.max_size:
+                started = time.monotonic()
+                self.metrics["waits"] += 1
+                try:
+                    await asyncio.wait_for(
+                        self._cond.wait_for(lambda: self._idle or self._size < self.max_size),
+                        timeout
+                    )
+                except asyncio.TimeoutError:
+                    raise PoolTimeout(f"No connection to {self.db_name} available within {timeout}s")
+                finally:
+                    self.metrics["wait_time_total"] += time.monotonic() - started
+            self.metrics["acquired"] += 1
+            if self._idle:
+                return self._idle.pop()[0]
+            self._size += 1
+        try:
+            return await self._connect()
+        except Exception:
+            async with self._cond:
+                self._size -= 1
+                self._cond.notify()
+            raise
+
+    async def release(self, conn):
+        try:
+            if conn.in_transaction:
+                await conn.rollback()
+            healthy = True
+        except Exception:
+            healthy = False
+        async with self._cond:
+            if healthy and not self._closed:
+                self._idle.append((conn, time.monotonic()))
+            else:
+                await self._discard(conn)
+            self._cond.notify()
+
+    @asynccontextmanager
+    async def connection(self, timeout=None):
+        started = time.perf_counter()
+        conn = await self.acquire(timeout)
+        if profiler.enabled:
+            profiler.note_acquire(time.perf_counter() - started)
+        try:
+            yield conn
+        finally:
+            await self.release(conn)
+
+    @property
+    def in_use(self):
+        return self._size - len(self._idle)
+
+    def stats(self):
+        stats = dict(self.metrics)
+        stats.update(size=self._size, idle=len(self._idle), in_use=self.in_use)
+        return stats
+
+    async def close(self):
+        """Closes idle connections now and checked-out ones when released."""
+        async with self._cond:
+            self._closed = True
+            while self._idle:
+                await self._discard(self._idle.pop()[0])
+            self._cond.notify_all()
+
+
+def pool_in_use(db_name):
+    """Connections checked out of db_name's pool; 0 without creating one."""
+    pool = _pools.get(db_name)
+    return pool.in_use if pool is not None else 0
+
+
+# asyncio primitives belong to one event loop, so async pools are per loop.
+# Each aiosqlite connection owns a worker thread, so a loop's pools must be
+# closed before it goes away; see _close_on_shutdown.
+_async_pools = weakref.WeakKeyDictionary()
+
+
+async def _close_on_shutdown(pools):
+    """
+    Parked at its yield for the loop's lifetime. loop.shutdown_asyncgens(),
+    which asyncio.run() and asyncio.Runner call on exit, closes it and so
+    closes the loop's pools.
+    """
+    try:
+        yield
+    finally:
+        for pool in list(pools.values()):
+            await pool.close()
+        pools.clear()
+
+
+def get_async_pool(db_name="users.db", **options):
+    """Returns the aiosqlite pool for db_name on the running event loop."""
+    loop = asyncio.get_running_loop()
+    entry = _async_pools.get(loop)
+    if entry is None:
+        pools = {}
+        closer = _close_on_shutdown(pools)
+        # Advancing it to the yield registers it with the loop's shutdown
+        asyncio.ensure_future(closer.__anext__())
+        entry = _async_pools[loop] = (pools, closer)
+    pools = entry[0]
+    pool = pools.get(db_name)
+    if pool is None:
+        pool = pools[db_name] = AsyncConnectionPool(db_name, **options)
+    return pool
+
+
+def async_pool_in_use(db_name):
+    """pool_in_use for the running loop's aiosqlite pool."""
+    entry = _async_pools.get(asyncio.get_running_loop())
+    pool = entry[0].get(db_name) if entry is not None else None
+    return pool.in_use if pool is not None else 0
+
+
+async def close_async_pools():
+    """
+    Closes the running loop's pools. Only needed for loops not shut down
+    through asyncio.run() / asyncio.Runner (or loop.shutdown_asyncgens()).
+    """
+    entry = _async_pools.pop(asyncio.get_running_loop(), None)
+    if entry is not None:
+        await entry[1].aclose()
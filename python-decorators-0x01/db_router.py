@@ -0,0 +1,83 @@
+"""
+Read-replica routing for with_db_connection.
+
+Reads go to one of the configured replica databases. A call is a read if
+its function is marked with @reads or if its query argument is a SELECT.
+Writes, and any function wrapped by transactional, go to the primary.
+After a transactional write, reads from the same thread or task stay on
+the primary for sticky_seconds, so callers always see their own writes.
+"""
+import contextvars
+import itertools
+import time
+
+from db_pool import pool_in_use
+
+
+def reads(func):
+    """Marks a function as read-only so it can be served by a replica."""
+    func.db_access = "read"
+    return func
+
+
+def writes(func):
+    """Marks a function as writing so it always runs on the primary."""
+    func.db_access = "write"
+    return func
+
+
+class ReplicaRouter:
+    def __init__(self, primary="users.db", replicas=(), strategy="round_robin", sticky_seconds=5.0):
+        if strategy not in ("round_robin", "least_loaded"):
+            raise ValueError(f"Unknown routing strategy: {strategy}")
+        self.primary = primary
+        self.replicas = list(replicas)
+        self.strategy = strategy
+        self.sticky_seconds = sticky_seconds
+        self._next = itertools.count()
+        self._last_write = contextvars.ContextVar("last_write", default=None)
+
+    def note_write(self):
+        self._last_write.set(time.monotonic())
+
+    def is_read(self, func, args, kwargs):
+        access = getattr(func, "db_access", None)
+        if access is not None:
+            return access == "read"
+        query = kwargs.get("query")
+        if query is None:
+            query = next((arg for arg in args if isinstance(arg, str)), None)
+        return bool(query) and query.lstrip().upper().startswith("SELECT")
+
+    def database_for(self, func, args, kwargs, load=pool_in_use):
+        """
+        Picks the database a call to func(*args, **kwargs) should use.
+        load(db_name) gives a replica's checked-out connections for
+        least_loaded; callers pass the pool family they will borrow from.
+        """
+        if not self.replicas or not self.is_read(func, args, kwargs):
+            return self.primary
+        last_write = self._last_write.get()
+        if last_write is not None and time.monotonic() - last_write < self.sticky_seconds:
+            return self.primary
+        if self.strategy == "least_loaded":
+            return min(self.replicas, key=load)
+        return self.replicas[next(self._next) % len(self.replicas)]
+
+
+router = ReplicaRouter()
+
+
+def configure_replicas(primary="users.db", replicas=(), **options):
+    """Replaces the process-wide router used by with_db_connection."""
+    global router
+    router = ReplicaRouter(primary, replicas, **options)
+    return router
+
+
+def database_for(func, args, kwargs, load=pool_in_use):
+    return router.database_for(func, args, kwargs, load)
+
+
+def note_write():
+    router.note_write()
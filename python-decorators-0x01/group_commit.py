@@ -0,0 +1,149 @@
+"""
+Group commit for small SQLite write transactions.
+
+Writes submitted from many threads are queued to a single writer thread,
+which runs up to max_batch of them inside one transaction and commits once
+the batch is full or max_latency seconds after the first write arrived.
+Each write runs in its own SAVEPOINT, so a failing write is rolled back on
+its own and the rest of the batch still commits. Submitters block until
+the commit that contains their write has finished, for at most timeout
+seconds. If the writer thread dies (e.g. the database cannot be opened)
+every write in flight or queued fails with its error, and the next submit
+starts a new writer.
+"""
+import queue
+import sqlite3
+import threading
+import time
+
+from db_pool import apply_pragmas
+from query_cache import invalidate_tables, is_write, tables_in
+
+
+class _Pending:
+    def __init__(self, fn):
+        self.fn = fn
+        self.result = None
+        self.error = None
+        self.done = threading.Event()
+
+
+class GroupCommitter:
+    def __init__(self, db_name, max_batch=256, max_latency=0.005, timeout=30):
+        self.db_name = db_name
+        self.max_batch = max_batch
+        self.max_latency = max_latency
+        self.timeout = timeout
+        self.batches = 0
+        self.writes = 0
+        self._queue = queue.Queue()
+        self._thread = None
+        self._start_lock = threading.Lock()
+
+    def submit(self, fn):
+        """
+        Runs fn(conn) in the next group transaction and returns its result
+        once committed. fn must not commit or roll back itself.
+        """
+        self._start()
+        pending = _Pending(fn)
+        self._queue.put(pending)
+        deadline = time.monotonic() + self.timeout
+        while not pending.done.wait(0.05):
+            # Restarts a writer that died after this write was queued
+            self._start()
+            if time.monotonic() >= deadline:
+                raise TimeoutError(
+                    f"Group commit to {self.db_name} did not finish within {self.timeout}s; "
+                    "the write may still be committed"
+                )
+        if pending.error is not None:
+            raise pending.error
+        return pending.result
+
+    def _start(self):
+        with self._start_lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name="group-commit", daemon=True)
+                self._thread.start()
+
+    def _run(self):
+        batch = []
+        try:
+            # Autocommit mode: BEGIN/SAVEPOINT/COMMIT are issued explicitly
+            conn = sqlite3.connect(self.db_name, isolation_level=None)
+            apply_pragmas(conn)
+            while True:
+                batch = [self._queue.get()]
+                deadline = time.monotonic() + self.max_latency
+                while len(batch) < self.max_batch:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    try:
+                        batch.append(self._queue.get(timeout=remaining))
+                    except queue.Empty:
+                        break
+                self._commit(conn, batch)
+                batch = []
+        except BaseException as e:
+            # Fail everything in flight or queued instead of leaving the
+            # submitters waiting on a writer that is gone
+            with self._start_lock:
+                self._thread = None
+                while True:
+                    try:
+                        batch.append(self._queue.get_nowait())
+                    except queue.Empty:
+                        break
+            for pending in batch:
+                if not pending.done.is_set():
+                    pending.error = e
+                    pending.done.set()
+
+    def _commit(self, conn, batch):
+        written = set()
+
+        def track_writes(statement):
+            if is_write(statement):
+                written.update(tables_in(statement))
+
+        conn.set_trace_callback(track_writes)
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            for pending in batch:
+                conn.execute("SAVEPOINT group_write")
+                try:
+                    pending.result = pending.fn(conn)
+                except BaseException as e:
+                    conn.execute("ROLLBACK TO group_write")
+                    pending.error = e
+                conn.execute("RELEASE group_write")
+            conn.execute("COMMIT")
+            self.batches += 1
+            self.writes += len(batch)
+        except BaseException as e:
+            if conn.in_transaction:
+                conn.execute("ROLLBACK")
+            for pending in batch:
+                if pending.error is None:
+                    pending.error = e
+        finally:
+            conn.set_trace_callback(None)
+            if written:
+                invalidate_tables(written)
+            for pending in batch:
+                pending.done.set()
+
+
+_committers = {}
+_committers_lock = threading.Lock()
+
+
+def get_group_committer(db_name="users.db", **options):
+    """Returns the shared group committer for db_name."""
+    with _committers_lock:
+        committer = _committers.get(db_name)
+        if committer is None:
+            committer = _committers[db_name] = GroupCommitter(db_name, **options)
+        return committer
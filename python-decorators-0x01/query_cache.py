@@ -0,0 +1,303 @@
+"""
+Bounded query result cache shared by cache_query and transactional.
+
+Entries are keyed on (database, SQL, parameters), expire after a TTL and are
+evicted least-recently-used once either the entry count or the estimated
+memory limit is exceeded. Each entry is tagged with the tables its query
+reads, so a committed write to a table drops every cached result that
+depends on it.
+
+Invalidation also bumps a per-table generation. A caller takes
+generation(tables) before running its query and passes it to set, which
+drops the result if any of those tables was written in the meantime, so a
+read that overlapped a write cannot cache the rows it saw before it.
+"""
+import asyncio
+import re
+import sys
+import threading
+import time
+import weakref
+from collections import OrderedDict
+
+TABLE_PATTERN = re.compile(r"\b(?:FROM|JOIN|INTO|UPDATE|TABLE)\s+[\"'`\[]?(\w+)", re.IGNORECASE)
+WRITE_PATTERN = re.compile(r"^\s*(?:INSERT|UPDATE|DELETE|REPLACE|CREATE|DROP|ALTER)\b", re.IGNORECASE)
+
+
+def tables_in(sql):
+    """Returns the lower-cased table names referenced by a statement."""
+    return frozenset(name.lower() for name in TABLE_PATTERN.findall(sql or ""))
+
+
+def is_write(sql):
+    return bool(WRITE_PATTERN.match(sql or ""))
+
+
+def estimate_size(value):
+    """Rough deep size of a query result (lists/tuples of scalars)."""
+    size = sys.getsizeof(value)
+    if isinstance(value, (list, tuple)):
+        for item in value:
+            size += estimate_size(item)
+    elif isinstance(value, dict):
+        for key, item in value.items():
+            size += estimate_size(key) + estimate_size(item)
+    return size
+
+
+def database_of(conn):
+    """Identifies the database file behind a connection."""
+    name = getattr(conn, "db_name", None)
+    if name is None:
+        row = conn.execute("PRAGMA database_list").fetchone()
+        name = row[2] if row else None
+    return name
+
+
+class QueryCache:
+    def __init__(self, max_entries=1024, max_bytes=64 * 1024 * 1024, ttl=300):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self._entries = OrderedDict()  # key -> (value, size, expires_at, tables)
+        self._by_table = {}
+        self._generations = {}
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+        self.stale_drops = 0
+
+    @staticmethod
+    def make_key(database, query, params=()):
+        if isinstance(params, dict):
+            params = tuple(sorted(params.items()))
+        elif params is not None:
+            params = tuple(params)
+        return (database, query, params)
+
+    def get(self, key, record=True):
+        """
+        Returns (True, value) on a fresh hit, (False, None) otherwise.
+        record=False leaves the hit/miss counters untouched.
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[2] is not None and entry[2] < time.monotonic():
+                self._remove(key)
+                entry = None
+            if entry is None:
+                self.misses += record
+                return False, None
+            self._entries.move_to_end(key)
+            self.hits += record
+            return True, entry[0]
+
+    def generation(self, tables):
+        """Snapshot of the tables' write generations, for set(generation=...)."""
+        with self._lock:
+            return tuple(self._generations.get(table, 0) for table in sorted(tables))
+
+    def set(self, key, value, ttl=None, tables=None, generation=None):
+        """
+        Stores value. With generation (from generation() on the same tables,
+        taken before the query ran) the value is dropped if any of the
+        tables has been invalidated since.
+        """
+        ttl = self.ttl if ttl is None else ttl
+        size = estimate_size(value)
+        if size > self.max_bytes:
+            return
+        tables = tables_in(key[1]) if tables is None else frozenset(tables)
+        expires_at = time.monotonic() + ttl if ttl else None
+        with self._lock:
+            if generation is not None and tuple(generation) != tuple(
+                self._generations.get(table, 0) for table in sorted(tables)
+            ):
+                self.stale_drops += 1
+                return
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = (value, size, expires_at, tables)
+            self._bytes += size
+            for table in tables:
+                self._by_table.setdefault(table, set()).add(key)
+            while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+                self._remove(next(iter(self._entries)))
+                self.evictions += 1
+
+    def invalidate_tables(self, tables):
+        """Drops every entry tagged with any of the given tables and bumps their generations."""
+        with self._lock:
+            for table in tables:
+                table = table.lower()
+                self._generations[table] = self._generations.get(table, 0) + 1
+                for key in list(self._by_table.get(table, ())):
+                    self._remove(key)
+                    self.invalidations += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._by_table.clear()
+            self._bytes = 0
+
+    def _remove(self, key):
+        _, size, _, tables = self._entries.pop(key)
+        self._bytes -= size
+        for table in tables:
+            keys = self._by_table.get(table)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._by_table[table]
+
+    def stats(self):
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "invalidations": self.invalidations,
+                "stale_drops": self.stale_drops,
+            }
+
+    def __contains__(self, key):
+        return key in self._entries
+
+    def __len__(self):
+        return len(self._entries)
+
+
+class _Call:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+    """
+    Coalesces concurrent calls for the same key across threads: the first
+    caller runs fn while the others block until it finishes and then share
+    its result (or its exception).
+    """
+
+    def __init__(self):
+        self._calls = {}
+        self._lock = threading.Lock()
+        self.coalesced = 0
+
+    def do(self, key, fn):
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+            else:
+                self.coalesced += 1
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+        try:
+            call.result = fn()
+            return call.result
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+
+
+class AsyncSingleFlight:
+    """
+    Coalesces concurrent coroutine calls for the same key: the first caller
+    starts the work as a task and everyone else awaits that same task.
+
+    The task is shielded, so it keeps running when a caller is cancelled.
+    make_coro is the leader's and may use the leader's resources (cache_query
+    runs it on the leader's pooled connection), so a cancelled leader waits
+    for the task to finish before it propagates the cancellation; followers
+    leave at once.
+    """
+
+    def __init__(self):
+        self._calls = {}
+        self.coalesced = 0
+
+    async def do(self, key, make_coro):
+        loop = asyncio.get_running_loop()
+        call_key = (loop, key)
+        task = self._calls.get(call_key)
+        leader = task is None
+        if leader:
+            task = loop.create_task(make_coro())
+            self._calls[call_key] = task
+            task.add_done_callback(lambda _: self._calls.pop(call_key, None))
+        else:
+            self.coalesced += 1
+        # shield: one caller being cancelled must not cancel the shared work
+        try:
+            return await asyncio.shield(task)
+        except asyncio.CancelledError:
+            if leader:
+                while not task.done():
+                    try:
+                        await asyncio.wait((task,))
+                    except asyncio.CancelledError:
+                        pass
+            raise
+
+
+# Every cache cache_query has stored results in; transactional invalidates
+# all of them, not just the current default
+_caches = weakref.WeakSet()
+_caches_lock = threading.Lock()
+
+
+def register_cache(cache):
+    """Makes invalidate_tables reach cache; returns cache."""
+    with _caches_lock:
+        _caches.add(cache)
+    return cache
+
+
+# Process-wide cache used by cache_query and invalidated by transactional
+default_cache = register_cache(QueryCache())
+
+
+def get_default_cache():
+    return default_cache
+
+
+def set_default_cache(cache):
+    """
+    Swaps the backend used by cache_query and transactional, e.g. for a
+    cache_backends.SQLiteCacheBackend shared by all workers on the host.
+    """
+    global default_cache
+    default_cache = register_cache(cache)
+
+
+def invalidate_tables(tables):
+    """
+    Drops entries for tables from every registered cache. Called after a
+    commit has already succeeded, so it never raises: a backend that fails
+    (e.g. an unreachable Redis) is reported and the remaining caches are
+    still invalidated.
+    """
+    with _caches_lock:
+        caches = list(_caches)
+    for cache in caches:
+        try:
+            cache.invalidate_tables(tables)
+        except Exception as e:
+            print(f"[WARN] Cache invalidation failed for {type(cache).__name__}: {e!r}")
@@ -0,0 +1,206 @@
+"""
+Per-query latency profiling for the decorated database functions.
+
+Latencies are kept in HDR-style log-linear histograms (about 3% relative
+error, sparse buckets) per normalized query and per phase:
+
+    acquire  waiting for a pooled connection
+    execute  cursor.execute / executemany
+    fetch    fetchone / fetchmany / fetchall
+    total    the whole decorated call
+
+The pool and TrackingCursor only report while the profiler is enabled; when
+it is disabled, profile_queries costs one attribute check per call.
+"""
+import contextvars
+import functools
+import inspect
+import json
+import math
+import re
+import threading
+import time
+
+SUB_BITS = 6
+SUB_COUNT = 1 << SUB_BITS
+HALF_COUNT = SUB_COUNT >> 1
+
+_STRING = re.compile(r"'(?:[^']|'')*'")
+_NUMBER = re.compile(r"\b\d+(?:\.\d+)?\b")
+_IN_LIST = re.compile(r"\(\s*\?(?:\s*,\s*\?)+\s*\)")
+_SPACE = re.compile(r"\s+")
+
+
+def normalize(sql):
+    """Replaces literals with ? so queries differing only in values group together."""
+    sql = _STRING.sub("?", sql)
+    sql = _NUMBER.sub("?", sql)
+    sql = _IN_LIST.sub("(?)", sql)
+    return _SPACE.sub(" ", sql).strip()
+
+
+class Histogram:
+    """Log-linear histogram of nanosecond values."""
+
+    def __init__(self):
+        self.buckets = {}
+        self.count = 0
+        self.total = 0
+        self.min = None
+        self.max = 0
+
+    @staticmethod
+    def _index(value):
+        if value < SUB_COUNT:
+            return value
+        shift = value.bit_length() - SUB_BITS
+        return shift * HALF_COUNT + (value >> shift)
+
+    @staticmethod
+    def _value(index):
+        if index < SUB_COUNT:
+            return index
+        shift = (index - SUB_COUNT) // HALF_COUNT + 1
+        mantissa = index - shift * HALF_COUNT
+        # Midpoint of the bucket's range
+        return (mantissa << shift) + (1 << (shift - 1))
+
+    def record(self, nanos):
+        index = self._index(nanos)
+        self.buckets[index] = self.buckets.get(index, 0) + 1
+        self.count += 1
+        self.total += nanos
+        self.max = max(self.max, nanos)
+        self.min = nanos if self.min is None else min(self.min, nanos)
+
+    def percentile(self, p):
+        if not self.count:
+            return None
+        target = max(1, math.ceil(p / 100 * self.count))
+        seen = 0
+        for index in sorted(self.buckets):
+            seen += self.buckets[index]
+            if seen >= target:
+                return min(self._value(index), self.max)
+        return self.max
+
+    def summary(self):
+        """Milliseconds summary of the recorded values."""
+        if not self.count:
+            return {"count": 0}
+        return {
+            "count": self.count,
+            "mean_ms": self.total / self.count / 1e6,
+            "min_ms": self.min / 1e6,
+            "p50_ms": self.percentile(50) / 1e6,
+            "p95_ms": self.percentile(95) / 1e6,
+            "p99_ms": self.percentile(99) / 1e6,
+            "max_ms": self.max / 1e6,
+        }
+
+
+class QueryProfiler:
+    def __init__(self):
+        self.enabled = False
+        self._histograms = {}
+        self._lock = threading.Lock()
+        self._acquire = contextvars.ContextVar("acquire_seconds", default=None)
+
+    def enable(self):
+        self.enabled = True
+
+    def disable(self):
+        self.enabled = False
+
+    def reset(self):
+        with self._lock:
+            self._histograms.clear()
+
+    def record(self, sql, phase, seconds):
+        key = (normalize(sql), phase)
+        with self._lock:
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                histogram = self._histograms[key] = Histogram()
+            histogram.record(int(seconds * 1e9))
+
+    def note_acquire(self, seconds):
+        """Called by the pool; attributed to the next profiled query in this context."""
+        self._acquire.set(seconds)
+
+    def _take_acquire(self):
+        seconds = self._acquire.get()
+        if seconds is not None:
+            self._acquire.set(None)
+        return seconds
+
+    def percentiles(self, sql, phase="total"):
+        with self._lock:
+            histogram = self._histograms.get((normalize(sql), phase))
+            return histogram.summary() if histogram else None
+
+    def report(self):
+        """{normalized query: {phase: summary}} for everything recorded."""
+        with self._lock:
+            items = list(self._histograms.items())
+        report = {}
+        for (sql, phase), histogram in sorted(items):
+            report.setdefault(sql, {})[phase] = histogram.summary()
+        return report
+
+    def dump_json(self, path):
+        with open(path, "w", encoding="utf-8") as file:
+            json.dump(self.report(), file, indent=2)
+
+
+profiler = QueryProfiler()
+
+
+def profile_queries(func):
+    """
+    Records the total latency of each call under its normalized query, along
+    with the pool's acquire time for the connection it was given. Reads the
+    query the same way log_queries does.
+    """
+    if inspect.iscoroutinefunction(func):
+        @functools.wraps(func)
+        async def async_wrapper(*args, **kwargs):
+            if not profiler.enabled:
+                return await func(*args, **kwargs)
+            query = _find_query(args, kwargs)
+            started = time.perf_counter()
+            try:
+                return await func(*args, **kwargs)
+            finally:
+                _record_call(query, started)
+        return async_wrapper
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        if not profiler.enabled:
+            return func(*args, **kwargs)
+        query = _find_query(args, kwargs)
+        started = time.perf_counter()
+        try:
+            return func(*args, **kwargs)
+        finally:
+            _record_call(query, started)
+    return wrapper
+
+
+def _find_query(args, kwargs):
+    query = kwargs.get('query')
+    if query is None:
+        # With with_db_connection the connection comes first
+        query = next((arg for arg in args if isinstance(arg, str)), None)
+    return query
+
+
+def _record_call(query, started):
+    elapsed = time.perf_counter() - started
+    acquire = profiler._take_acquire()
+    if query is None:
+        return
+    profiler.record(query, "total", elapsed)
+    if acquire is not None:
+        profiler.record(query, "acquire", acquire)
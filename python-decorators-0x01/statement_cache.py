@@ -0,0 +1,124 @@
+"""
+Per-connection prepared statement bookkeeping.
+
+sqlite3 already keeps an LRU cache of compiled statements on every
+connection (sized by connect(cached_statements=...)), so repeated SQL text
+is parsed once per connection. StatementCache mirrors that cache, with the
+same size and LRU order, and records executions, execute time and rows
+fetched for each statement, so hot queries and cache churn are visible.
+"""
+import sqlite3
+import time
+from collections import OrderedDict
+
+from query_profiler import profiler
+
+
+class StatementStats:
+    __slots__ = ("executions", "total_time", "rows")
+
+    def __init__(self):
+        self.executions = 0
+        self.total_time = 0.0
+        self.rows = 0
+
+    def as_dict(self):
+        return {"executions": self.executions, "total_time": self.total_time, "rows": self.rows}
+
+
+class StatementCache:
+    def __init__(self, max_size=128):
+        self.max_size = max_size
+        self.statements = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def lookup(self, sql):
+        """Returns the stats for sql, marking it most recently used."""
+        stats = self.statements.get(sql)
+        if stats is not None:
+            self.statements.move_to_end(sql)
+            self.hits += 1
+            return stats
+        self.misses += 1
+        stats = self.statements[sql] = StatementStats()
+        if len(self.statements) > self.max_size:
+            self.statements.popitem(last=False)
+            self.evictions += 1
+        return stats
+
+    def snapshot(self):
+        return {sql: stats.as_dict() for sql, stats in self.statements.items()}
+
+
+class TrackingCursor(sqlite3.Cursor):
+    """Cursor that reports execute time and fetched rows to its connection."""
+
+    _stats = None
+    _sql = None
+
+    def execute(self, sql, parameters=()):
+        self._sql = sql
+        self._stats = self.connection.statements.lookup(sql)
+        started = time.perf_counter()
+        try:
+            return super().execute(sql, parameters)
+        finally:
+            elapsed = time.perf_counter() - started
+            self._stats.executions += 1
+            self._stats.total_time += elapsed
+            if profiler.enabled:
+                profiler.record(sql, "execute", elapsed)
+
+    def executemany(self, sql, seq_of_parameters):
+        self._sql = sql
+        self._stats = self.connection.statements.lookup(sql)
+        started = time.perf_counter()
+        try:
+            return super().executemany(sql, seq_of_parameters)
+        finally:
+            elapsed = time.perf_counter() - started
+            self._stats.executions += 1
+            self._stats.total_time += elapsed
+            if profiler.enabled:
+                profiler.record(sql, "execute", elapsed)
+
+    def fetchone(self):
+        started = time.perf_counter() if profiler.enabled else None
+        row = super().fetchone()
+        self._record_fetch(started)
+        if row is not None and self._stats is not None:
+            self._stats.rows += 1
+        return row
+
+    def fetchmany(self, size=None):
+        started = time.perf_counter() if profiler.enabled else None
+        rows = super().fetchmany(self.arraysize if size is None else size)
+        self._record_fetch(started)
+        if self._stats is not None:
+            self._stats.rows += len(rows)
+        return rows
+
+    def fetchall(self):
+        started = time.perf_counter() if profiler.enabled else None
+        rows = super().fetchall()
+        self._record_fetch(started)
+        if self._stats is not None:
+            self._stats.rows += len(rows)
+        return rows
+
+    def _record_fetch(self, started):
+        if started is not None and self._sql is not None:
+            profiler.record(self._sql, "fetch", time.perf_counter() - started)
+
+
+def merge_snapshots(snapshots):
+    """Sums per-statement stats from several connections."""
+    merged = {}
+    for snapshot in snapshots:
+        for sql, stats in snapshot.items():
+            total = merged.setdefault(sql, {"executions": 0, "total_time": 0.0, "rows": 0})
+            for field, value in stats.items():
+                total[field] += value
+    return merged
@@ -0,0 +1,79 @@
+#!/usr/bin/env python3
+"""Unit tests for the cache_backends module."""
+
+import os
+import tempfile
+import unittest
+
+from cache_backends import SQLiteCacheBackend, decode, encode
+
+
+class TestCodec(unittest.TestCase):
+    """Test cases for the binary result encoding."""
+
+    def test_round_trip(self):
+        """Test that query results survive encode/decode unchanged."""
+        value = [(1, "a", None, 2.5, b"\x00", True, -300, 2 ** 70), (2, "b", None, 0.0, b"", False, 0, 7)]
+        self.assertEqual(decode(encode(value)), value)
+
+    def test_unsupported_type(self):
+        """Test that values outside the format raise TypeError."""
+        with self.assertRaises(TypeError):
+            encode([{"id": 1}])
+
+
+class TestSQLiteCacheBackend(unittest.TestCase):
+    """Test cases for the shared SQLite cache backend."""
+
+    def setUp(self):
+        """Open a backend on a throwaway cache file."""
+        self.tmp = tempfile.TemporaryDirectory()
+        self.cache = SQLiteCacheBackend(os.path.join(self.tmp.name, "cache.db"), max_entries=2)
+
+    def tearDown(self):
+        """Close the connection and remove the cache file."""
+        self.cache._conn().close()
+        self.tmp.cleanup()
+
+    def count(self, table):
+        """Returns the number of rows in one of the backend's tables."""
+        return self.cache._conn().execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0]
+
+    def test_lru_trim_drops_tags(self):
+        """Test that trimming to max_entries also removes the entries' tags."""
+        for i in range(4):
+            self.cache.set(("db", f"SELECT * FROM users JOIN t{i} ON 1", ()), [(i,)])
+        self.assertEqual(self.count("cache"), 2)
+        self.assertEqual(self.count("cache_tags"), 4)
+        self.assertEqual(self.cache.get(("db", "SELECT * FROM users JOIN t3 ON 1", ())), (True, [(3,)]))
+
+    def test_expired_entry_is_miss(self):
+        """Test that an entry past its TTL is a miss."""
+        key = ("db", "SELECT * FROM users", ())
+        self.cache.set(key, [(1,)], ttl=-1)
+        self.assertEqual(self.cache.get(key), (False, None))
+
+    def test_invalidate_tables(self):
+        """Test that invalidation drops the entries and all of their tags."""
+        key = ("db", "SELECT * FROM users JOIN orders ON 1", ())
+        self.cache.set(key, [(1,)])
+        self.cache.invalidate_tables(["users"])
+        self.assertEqual(self.cache.get(key), (False, None))
+        self.assertEqual(self.count("cache_tags"), 0)
+        self.assertFalse(self.cache._conn().in_transaction)
+
+    def test_set_after_invalidation_is_dropped(self):
+        """Test that a result read before a write is not cached after it."""
+        key = ("db", "SELECT * FROM users", ())
+        generation = self.cache.generation({"users"})
+        other = SQLiteCacheBackend(self.cache.path)
+        other.invalidate_tables(["users"])
+        other._conn().close()
+        self.cache.set(key, [("stale",)], generation=generation)
+        self.assertEqual(self.cache.get(key), (False, None))
+        self.assertEqual(self.cache.stats()["stale_drops"], 1)
+        self.assertFalse(self.cache._conn().in_transaction)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,158 @@
+#!/usr/bin/env python3
+"""Unit tests for the query_cache module and cache_query."""
+
+import os
+import sqlite3
+import tempfile
+import threading
+import unittest
+from unittest.mock import patch
+
+import query_cache
+from query_cache import QueryCache
+
+
+class TestQueryCache(unittest.TestCase):
+    """Test cases for QueryCache eviction, expiry and invalidation."""
+
+    def test_lru_eviction_by_entries(self):
+        """Test that the least recently used entry is evicted first."""
+        cache = QueryCache(max_entries=2)
+        cache.set(("db", "SELECT * FROM a", ()), 1)
+        cache.set(("db", "SELECT * FROM b", ()), 2)
+        cache.get(("db", "SELECT * FROM a", ()))
+        cache.set(("db", "SELECT * FROM c", ()), 3)
+        self.assertIn(("db", "SELECT * FROM a", ()), cache)
+        self.assertNotIn(("db", "SELECT * FROM b", ()), cache)
+        self.assertEqual(cache.stats()["evictions"], 1)
+
+    def test_eviction_by_bytes(self):
+        """Test that entries are evicted once max_bytes is exceeded."""
+        value = "x" * 1000
+        size = query_cache.estimate_size(value)
+        cache = QueryCache(max_bytes=size * 2)
+        for i in range(3):
+            cache.set(("db", f"SELECT {i} FROM a", ()), value)
+        self.assertEqual(len(cache), 2)
+        self.assertLessEqual(cache.stats()["bytes"], size * 2)
+
+    def test_value_larger_than_limit_not_stored(self):
+        """Test that a value bigger than max_bytes is never cached."""
+        cache = QueryCache(max_bytes=100)
+        cache.set(("db", "SELECT * FROM a", ()), "x" * 1000)
+        self.assertEqual(len(cache), 0)
+
+    def test_ttl_expiry(self):
+        """Test that an entry is a miss once its TTL has passed."""
+        cache = QueryCache(ttl=10)
+        key = ("db", "SELECT * FROM a", ())
+        with patch("query_cache.time.monotonic", return_value=100.0):
+            cache.set(key, [(1,)])
+        with patch("query_cache.time.monotonic", return_value=109.0):
+            self.assertEqual(cache.get(key), (True, [(1,)]))
+        with patch("query_cache.time.monotonic", return_value=111.0):
+            self.assertEqual(cache.get(key), (False, None))
+        self.assertEqual(len(cache), 0)
+
+    def test_invalidate_tables(self):
+        """Test that invalidation drops only entries reading those tables."""
+        cache = QueryCache()
+        users = ("db", "SELECT * FROM users JOIN orders ON 1", ())
+        other = ("db", "SELECT * FROM products", ())
+        cache.set(users, [(1,)])
+        cache.set(other, [(2,)])
+        cache.invalidate_tables(["ORDERS"])
+        self.assertNotIn(users, cache)
+        self.assertIn(other, cache)
+        self.assertEqual(cache.stats()["invalidations"], 1)
+
+    def test_set_after_invalidation_is_dropped(self):
+        """Test that a result read before a write is not cached after it."""
+        cache = QueryCache()
+        key = ("db", "SELECT * FROM users", ())
+        generation = cache.generation({"users"})
+        cache.invalidate_tables(["users"])
+        cache.set(key, [("stale",)], generation=generation)
+        self.assertNotIn(key, cache)
+        self.assertEqual(cache.stats()["stale_drops"], 1)
+        cache.set(key, [("fresh",)], generation=cache.generation({"users"}))
+        self.assertEqual(cache.get(key), (True, [("fresh",)]))
+
+    def test_invalidate_reaches_registered_caches(self):
+        """Test that invalidate_tables reaches every registered cache."""
+        cache = query_cache.register_cache(QueryCache())
+        key = ("db", "SELECT * FROM users", ())
+        cache.set(key, [(1,)])
+        query_cache.invalidate_tables(["users"])
+        self.assertNotIn(key, cache)
+
+    def test_failing_cache_does_not_stop_invalidation(self):
+        """Test that one failing backend neither raises nor blocks the rest."""
+        class Broken:
+            def invalidate_tables(self, tables):
+                raise ConnectionRefusedError("down")
+
+        broken = query_cache.register_cache(Broken())
+        cache = query_cache.register_cache(QueryCache())
+        key = ("db", "SELECT * FROM users", ())
+        cache.set(key, [(1,)])
+        with patch("builtins.print"):
+            query_cache.invalidate_tables(["users"])
+        self.assertNotIn(key, cache)
+        del broken
+
+
+class TestCacheQueryRace(unittest.TestCase):
+    """Test that cache_query does not cache rows read across a write."""
+
+    @classmethod
+    def setUpClass(cls):
+        """Import 4-cache_query in a directory holding a users.db."""
+        cls.cwd = os.getcwd()
+        cls.tmp = tempfile.TemporaryDirectory()
+        os.chdir(cls.tmp.name)
+        with sqlite3.connect("users.db") as conn:
+            conn.execute("CREATE TABLE users (id INTEGER PRIMARY KEY, name TEXT, email TEXT, age INTEGER)")
+            conn.execute("INSERT INTO users VALUES (1, 'a', 'a@example.com', 1)")
+        with patch("builtins.print"):
+            cls.module = __import__("4-cache_query")
+
+    @classmethod
+    def tearDownClass(cls):
+        """Leave the temporary directory."""
+        os.chdir(cls.cwd)
+        cls.tmp.cleanup()
+
+    def test_read_overlapping_write_is_not_cached(self):
+        """Test that a later call sees the write, not the overlapping read."""
+        cache = QueryCache()
+        fetched = threading.Event()
+        resume = threading.Event()
+
+        @self.module.cache_query(cache=cache)
+        def read(conn, query):
+            rows = conn.execute(query).fetchall()
+            if not resume.is_set():
+                fetched.set()
+                resume.wait(5)
+            return rows
+
+        reader = sqlite3.connect("users.db", check_same_thread=False)
+        writer = sqlite3.connect("users.db")
+        query = "SELECT age FROM users WHERE id = 1"
+        thread = threading.Thread(target=read, args=(reader, query))
+        thread.start()
+        self.assertTrue(fetched.wait(5))
+        writer.execute("UPDATE users SET age = 999 WHERE id = 1")
+        writer.commit()
+        query_cache.invalidate_tables(["users"])
+        resume.set()
+        thread.join(5)
+        with patch("builtins.print"):
+            self.assertEqual(read(reader, query), [(999,)])
+        reader.close()
+        writer.close()
+
+
+if __name__ == "__main__":
+    unittest.main()
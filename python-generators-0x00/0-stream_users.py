@@ -1,37 +1,65 @@
 #!/usr/bin/python3
 import sqlite3
 
-def stream_users():
+COLUMNS = ("user_id", "name", "email", "age")
+
+def stream_users(arraysize=1000):
     """
     Generator function that streams users from the database one by one.
     Yields each user as a dictionary with user_id, name, email, and age.
+
+    Rows are pulled from the cursor arraysize at a time with fetchmany,
+    but are still yielded lazily one user at a time.
     """
     conn = sqlite3.connect("users.db")
     cursor = conn.cursor()
-    
+    cursor.arraysize = arraysize
+
     try:
         cursor.execute("SELECT user_id, name, email, age FROM user_data")
-        
-        while True:
-            row = cursor.fetchone()
-            if row is None:
-                break
-            
-            user = {
-                "user_id": row[0],
-                "name": row[1],
-                "email": row[2],
-                "age": row[3]
-            }
-            yield user
-    
+        yield from _iter_users(cursor)
+
     finally:
         conn.close()
 
+def stream_users_server_side(arraysize=1000):
+    """
+    Streams users from the MySQL ALX_prodev database through an unbuffered
+    (server-side) cursor, so rows are read off the wire as they are consumed
+    instead of being loaded into client memory up front.
+    """
+    seed = __import__('seed')
+    connection = seed.connect_to_prodev()
+    if connection is None:
+        return
+    # Let close() drain any rows left on the wire if the caller stops early
+    connection.can_consume_results = True
+    cursor = connection.cursor(buffered=False)
+    cursor.arraysize = arraysize
+
+    try:
+        cursor.execute("SELECT user_id, name, email, age FROM user_data")
+        yield from _iter_users(cursor)
+
+    finally:
+        cursor.close()
+        connection.close()
+
+def _iter_users(cursor):
+    """
+    Yields user dictionaries from an executed cursor using fetchmany.
+    """
+    while True:
+        rows = cursor.fetchmany(cursor.arraysize)
+        if not rows:
+            break
+        for row in rows:
+            yield dict(zip(COLUMNS, row))
+
 # Make the function directly callable when the module is imported
-__all__ = ['stream_users']
+__all__ = ['stream_users', 'stream_users_server_side']
 
 # If called as a script, you can test it directly
 if __name__ == "__main__":
     for user in stream_users():
-        print(user)
\ No newline at end of file
+        print(user)
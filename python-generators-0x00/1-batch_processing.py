@@ -1,24 +1,64 @@
 import sqlite3
 import json
+from array import array
+from itertools import compress
 
-def stream_users_in_batches(batch_size):
+try:
+    import numpy as np
+except ImportError:  # NumPy is optional; fall back to array-backed columns
+    np = None
+
+def stream_users_in_batches(batch_size, keyset=False):
     """
     Fetches rows in batches from the 'user_data' table.
     Yields each batch using SQL with SELECT and FROM user_data.
+
+    With keyset=True each batch resumes after the last seen rowid
+    (WHERE rowid > ? ORDER BY rowid) on a single open cursor, so every
+    batch is a seek on the table's own b-tree instead of an OFFSET scan.
+    rowid rather than user_id is the key because user_id is not unique
+    (re-running setup_db.py duplicates rows), and rows sharing the last
+    user_id of a batch would be skipped.
     """
     conn = sqlite3.connect("users.db")
     cursor = conn.cursor()
 
-    offset = 0
+    try:
+        if keyset:
+            yield from _keyset_batches(cursor, batch_size)
+            return
+
+        offset = 0
+        while True:
+            cursor.execute("SELECT user_id, name, email, age FROM user_data LIMIT ? OFFSET ?", (batch_size, offset))
+            rows = cursor.fetchall()
+            if not rows:
+                break
+            yield rows  # ✅ yield used, not return
+            offset += batch_size
+    finally:
+        conn.close()
+
+def _keyset_batches(cursor, batch_size):
+    """
+    Yields batches in rowid order, seeking past the last rowid each time.
+    """
+    cursor.execute(
+        "SELECT rowid, user_id, name, email, age FROM user_data ORDER BY rowid LIMIT ?",
+        (batch_size,)
+    )
     while True:
-        cursor.execute("SELECT user_id, name, email, age FROM user_data LIMIT ? OFFSET ?", (batch_size, offset))
         rows = cursor.fetchall()
         if not rows:
             break
-        yield rows  # ✅ yield used, not return
-        offset += batch_size
-
-    conn.close()
+        yield [row[1:] for row in rows]
+        if len(rows) < batch_size:
+            break
+        cursor.execute(
+            "SELECT rowid, user_id, name, email, age FROM user_data "
+            "WHERE rowid > ? ORDER BY rowid LIMIT ?",
+            (rows[-1][0], batch_size)
+        )
 
 def batch_processing(batch_size):
     """
@@ -35,6 +75,70 @@ def batch_processing(batch_size):
             if user["age"] > 25:
                 yield json.dumps(user)
 
+def stream_user_columns(batch_size, min_age=None):
+    """
+    Yields each batch as a dict of columns instead of a list of rows.
+    Text columns are lists, age is a NumPy array (or array('q') without
+    NumPy). When min_age is given the filter runs in SQL as age > ?.
+    """
+    conn = sqlite3.connect("users.db")
+    cursor = conn.cursor()
+    cursor.arraysize = batch_size
+
+    query = "SELECT user_id, name, email, age FROM user_data"
+    params = ()
+    if min_age is not None:
+        query += " WHERE age > ?"
+        params = (min_age,)
+
+    try:
+        cursor.execute(query, params)
+        while True:
+            rows = cursor.fetchmany(batch_size)
+            if not rows:
+                break
+            user_ids, names, emails, ages = zip(*rows)
+            yield {
+                "user_id": list(user_ids),
+                "name": list(names),
+                "email": list(emails),
+                "age": np.fromiter(ages, dtype=np.int64, count=len(ages)) if np is not None else array('q', ages)
+            }
+    finally:
+        conn.close()
+
+def filter_columns(columns, min_age):
+    """
+    Applies age > min_age to a column batch as a single mask.
+    """
+    if np is not None:
+        mask = columns["age"] > min_age
+        ages = columns["age"][mask]
+    else:
+        mask = [age > min_age for age in columns["age"]]
+        ages = array('q', compress(columns["age"], mask))
+    return {
+        "user_id": list(compress(columns["user_id"], mask)),
+        "name": list(compress(columns["name"], mask)),
+        "email": list(compress(columns["email"], mask)),
+        "age": ages
+    }
+
+def batch_processing_columnar(batch_size, pushdown=True):
+    """
+    Columnar counterpart of batch_processing: yields column batches of users
+    older than 25. With pushdown the filter runs in SQL, otherwise it is
+    applied once per batch as a vectorized mask.
+    """
+    if pushdown:
+        yield from stream_user_columns(batch_size, min_age=25)
+        return
+
+    for columns in stream_user_columns(batch_size):
+        filtered = filter_columns(columns, 25)
+        if len(filtered["age"]):
+            yield filtered
+
 if __name__ == "__main__":
     import sys
     try:
@@ -1,19 +1,60 @@
 #!/usr/bin/python3
+from concurrent.futures import ThreadPoolExecutor
+
 seed = __import__('seed')
 
-def paginate_users(page_size, offset):
+PAGE_QUERY = "SELECT * FROM user_data LIMIT %s OFFSET %s"
+
+def paginate_users(page_size, offset, cursor=None):
+    """
+    Fetches one page of users. Pass a cursor to reuse an open connection,
+    otherwise a connection is opened and closed for this page alone.
+    """
+    if cursor is not None:
+        cursor.execute(PAGE_QUERY, (page_size, offset))
+        return cursor.fetchall()
+
     connection = seed.connect_to_prodev()
-    cursor = connection.cursor(dictionary=True)
-    cursor.execute(f"SELECT * FROM user_data LIMIT {page_size} OFFSET {offset}")
-    rows = cursor.fetchall()
-    connection.close()
-    return rows
+    if connection is None:
+        return []
+    try:
+        cursor = connection.cursor(dictionary=True)
+        cursor.execute(PAGE_QUERY, (page_size, offset))
+        return cursor.fetchall()
+    finally:
+        connection.close()
+
+def lazy_paginate(page_size, prefetch=False):
+    """
+    Lazily yields pages of users over a single connection with one
+    prepared, parameterized statement. With prefetch=True page N+1 is
+    fetched on a background thread while page N is being consumed.
+    """
+    connection = seed.connect_to_prodev()
+    if connection is None:
+        return
+    cursor = connection.cursor(prepared=True, dictionary=True)
+    executor = ThreadPoolExecutor(max_workers=1) if prefetch else None
+
+    def fetch(offset):
+        if executor is None:
+            return paginate_users(page_size, offset, cursor)
+        # All statements run on the one worker thread, never concurrently
+        return executor.submit(paginate_users, page_size, offset, cursor)
 
-def lazy_paginate(page_size):
-    offset = 0
-    while True:
-        page = paginate_users(page_size, offset)
-        if not page:
-            break
-        yield page
-        offset += page_size
+    try:
+        offset = 0
+        pending = fetch(offset)
+        while pending is not None:
+            page = pending.result() if executor is not None else pending
+            if not page:
+                break
+            offset += page_size
+            # A short page is the last one; skip the empty round trip
+            pending = fetch(offset) if len(page) == page_size else None
+            yield page
+    finally:
+        if executor is not None:
+            executor.shutdown(wait=True)
+        cursor.close()
+        connection.close()
@@ -1,16 +1,180 @@
-def stream_user_ages():
-    # Example data source - replace with actual data streaming logic
-    user_ages = [25, 30, 22, 40, 28, 35]
-    for age in user_ages:
-        yield age
+#!/usr/bin/python3
+import bisect
+import math
+import sqlite3
+
+
+def stream_user_ages(arraysize=1000):
+    """
+    Yields user ages one by one straight from the user_data table.
+    """
+    conn = sqlite3.connect("users.db")
+    cursor = conn.cursor()
+    try:
+        cursor.execute("SELECT age FROM user_data")
+        while True:
+            rows = cursor.fetchmany(arraysize)
+            if not rows:
+                break
+            for (age,) in rows:
+                yield age
+    finally:
+        conn.close()
+
+
+class TDigest:
+    """
+    Mergeable sketch for approximate percentiles in bounded memory.
+    Keeps roughly `compression` centroids, finer near the tails.
+    """
+
+    def __init__(self, compression=100):
+        self.compression = compression
+        self.centroids = []  # sorted [mean, weight] pairs
+        self.buffer = []
+        self.total = 0
+
+    def add(self, value, weight=1):
+        self.buffer.append((value, weight))
+        self.total += weight
+        if len(self.buffer) >= self.compression * 5:
+            self._compress()
+
+    def merge(self, other):
+        other._compress()
+        self.buffer.extend((mean, weight) for mean, weight in other.centroids)
+        self.total += other.total
+        self._compress()
+        return self
+
+    def _compress(self):
+        if not self.buffer:
+            return
+        points = sorted(self.centroids + [list(p) for p in self.buffer])
+        self.buffer = []
+        merged = [points[0]]
+        seen = 0
+        for mean, weight in points[1:]:
+            current = merged[-1]
+            proposed = current[1] + weight
+            q = (seen + proposed / 2) / self.total
+            if proposed <= 4 * self.total * q * (1 - q) / self.compression:
+                current[0] += (mean - current[0]) * weight / proposed
+                current[1] = proposed
+            else:
+                seen += current[1]
+                merged.append([mean, weight])
+        self.centroids = merged
+
+    def quantile(self, q):
+        """Returns the approximate value at quantile q (0 <= q <= 1)."""
+        self._compress()
+        if not self.centroids:
+            return None
+        if len(self.centroids) == 1:
+            return self.centroids[0][0]
+        # Cumulative weight at the centre of each centroid
+        centers = []
+        seen = 0
+        for _, weight in self.centroids:
+            centers.append(seen + weight / 2)
+            seen += weight
+        target = q * self.total
+        i = bisect.bisect_left(centers, target)
+        if i == 0:
+            return self.centroids[0][0]
+        if i == len(centers):
+            return self.centroids[-1][0]
+        left, right = centers[i - 1], centers[i]
+        fraction = (target - left) / (right - left)
+        lo, hi = self.centroids[i - 1][0], self.centroids[i][0]
+        return lo + (hi - lo) * fraction
+
+
+class AgeAggregate:
+    """
+    Single-pass, constant-memory summary of a stream of ages.
+    Partial aggregates computed on separate shards can be combined
+    with merge().
+    """
+
+    def __init__(self, compression=100):
+        self.count = 0
+        self.total = 0
+        self.mean = 0.0
+        self.m2 = 0.0
+        self.min = None
+        self.max = None
+        self.digest = TDigest(compression)
+
+    def add(self, age):
+        self.count += 1
+        self.total += age
+        # Welford's update keeps the variance numerically stable
+        delta = age - self.mean
+        self.mean += delta / self.count
+        self.m2 += delta * (age - self.mean)
+        self.min = age if self.min is None else min(self.min, age)
+        self.max = age if self.max is None else max(self.max, age)
+        self.digest.add(age)
+
+    def merge(self, other):
+        """Folds another partial aggregate into this one."""
+        if other.count == 0:
+            return self
+        if self.count == 0:
+            self.mean, self.m2 = other.mean, other.m2
+        else:
+            count = self.count + other.count
+            delta = other.mean - self.mean
+            self.m2 += other.m2 + delta * delta * self.count * other.count / count
+            self.mean += delta * other.count / count
+        self.count += other.count
+        self.total += other.total
+        self.min = other.min if self.min is None else min(self.min, other.min)
+        self.max = other.max if self.max is None else max(self.max, other.max)
+        self.digest.merge(other.digest)
+        return self
+
+    @property
+    def variance(self):
+        return self.m2 / self.count if self.count else 0.0
+
+    @property
+    def stddev(self):
+        return math.sqrt(self.variance)
+
+    def percentile(self, p):
+        """Approximate p-th percentile (0-100)."""
+        return self.digest.quantile(p / 100)
+
+    def summary(self):
+        return {
+            "count": self.count,
+            "sum": self.total,
+            "mean": self.mean if self.count else 0,
+            "variance": self.variance,
+            "min": self.min,
+            "max": self.max,
+            "p50": self.percentile(50),
+            "p95": self.percentile(95),
+            "p99": self.percentile(99),
+        }
+
+
+def aggregate_ages(ages):
+    """Consumes an iterable of ages into an AgeAggregate."""
+    aggregate = AgeAggregate()
+    for age in ages:
+        aggregate.add(age)
+    return aggregate
+
 
 def calculate_average_age():
-    total_age = 0
-    count = 0
-    for age in stream_user_ages():
-        total_age += age
-        count += 1
-    average_age = total_age / count if count > 0 else 0
+    aggregate = aggregate_ages(stream_user_ages())
+    average_age = aggregate.mean if aggregate.count > 0 else 0
     print(f"Average age of users: {average_age}")
 
-calculate_average_age()
+
+if __name__ == "__main__":
+    calculate_average_age()
@@ -0,0 +1,129 @@
+#!/usr/bin/python3
+"""
+async for counterparts of stream_users, stream_users_in_batches and
+lazy_paginate, so one event loop can stream several tables at once.
+"""
+import asyncio
+import time
+
+import aiosqlite
+
+DB_NAME = "users.db"
+COLUMNS = ("user_id", "name", "email", "age")
+
+
+class AdaptiveBatchSize:
+    """
+    Tunes the fetch size from observed timings: batches grow while fetches
+    are fast and shrink when fetches get slow or when the consumer lags far
+    behind, so rows are not piled up in memory faster than they are used.
+    """
+
+    def __init__(self, initial=500, minimum=50, maximum=10000, target_seconds=0.05):
+        self.size = initial
+        self.minimum = minimum
+        self.maximum = maximum
+        self.target_seconds = target_seconds
+
+    def update(self, fetch_seconds, consume_seconds):
+        if consume_seconds > 4 * fetch_seconds or fetch_seconds > self.target_seconds:
+            self.size = max(self.minimum, self.size // 2)
+        elif fetch_seconds < self.target_seconds / 2:
+            self.size = min(self.maximum, self.size * 2)
+        return self.size
+
+
+async def _adaptive_batches(cursor, batch_size):
+    """Yields fetchmany batches, resizing them when batch_size is adaptive."""
+    adaptive = batch_size if isinstance(batch_size, AdaptiveBatchSize) else None
+    size = adaptive.size if adaptive else batch_size
+    while True:
+        started = time.perf_counter()
+        rows = await cursor.fetchmany(size)
+        fetched = time.perf_counter()
+        if not rows:
+            break
+        yield rows
+        if adaptive:
+            size = adaptive.update(fetched - started, time.perf_counter() - fetched)
+
+
+async def stream_users(batch_size=None, db_name=DB_NAME):
+    """Async generator yielding users one by one as dictionaries."""
+    async with aiosqlite.connect(db_name) as db:
+        async with db.execute("SELECT user_id, name, email, age FROM user_data") as cursor:
+            async for rows in _adaptive_batches(cursor, batch_size or AdaptiveBatchSize()):
+                for row in rows:
+                    yield dict(zip(COLUMNS, row))
+
+
+async def stream_users_in_batches(batch_size, db_name=DB_NAME):
+    """
+    Async generator yielding lists of rows, resuming after the last seen
+    rowid for each batch (user_id is not unique, so seeking on it would
+    skip duplicates). batch_size may be an AdaptiveBatchSize.
+    """
+    adaptive = batch_size if isinstance(batch_size, AdaptiveBatchSize) else None
+    size = adaptive.size if adaptive else batch_size
+    last_id = None
+    async with aiosqlite.connect(db_name) as db:
+        while True:
+            started = time.perf_counter()
+            if last_id is None:
+                query = "SELECT rowid, user_id, name, email, age FROM user_data ORDER BY rowid LIMIT ?"
+                params = (size,)
+            else:
+                query = ("SELECT rowid, user_id, name, email, age FROM user_data "
+                         "WHERE rowid > ? ORDER BY rowid LIMIT ?")
+                params = (last_id, size)
+            async with db.execute(query, params) as cursor:
+                rows = await cursor.fetchall()
+            fetched = time.perf_counter()
+            if not rows:
+                break
+            yield [row[1:] for row in rows]
+            if len(rows) < size:
+                break
+            last_id = rows[-1][0]
+            if adaptive:
+                size = adaptive.update(fetched - started, time.perf_counter() - fetched)
+
+
+async def lazy_paginate(page_size):
+    """
+    Async generator yielding pages of users from the MySQL ALX_prodev
+    database over one aiomysql connection.
+    """
+    import aiomysql
+
+    connection = await aiomysql.connect(
+        host="localhost",
+        user="root",
+        password="your_password",
+        db="ALX_prodev"
+    )
+    try:
+        async with connection.cursor(aiomysql.DictCursor) as cursor:
+            offset = 0
+            while True:
+                await cursor.execute(
+                    "SELECT * FROM user_data LIMIT %s OFFSET %s", (page_size, offset)
+                )
+                page = await cursor.fetchall()
+                if not page:
+                    break
+                yield list(page)
+                if len(page) < page_size:
+                    break
+                offset += page_size
+    finally:
+        connection.close()
+
+
+async def main():
+    async for user in stream_users():
+        print(user)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,222 @@
+#!/usr/bin/python3
+"""
+Export user_data to a compact columnar file and read it back through mmap.
+
+Layout (all integers little-endian, every section 8-byte aligned):
+
+    header     b"USERCOL1", row count (u64), column count (u64)
+    directory  per column: name (16 bytes, NUL padded), kind (u64, 0 = int64,
+               1 = utf-8 string), data offset, data length, offsets offset
+    sections   int64 columns: one int64 per row
+               string columns: (rows + 1) u64 offsets followed by the bytes
+
+Readers get memoryview slices over the mapped file, so repeated scans do not
+hit the database or copy the data.
+"""
+import mmap
+import shutil
+import sqlite3
+import struct
+import sys
+import tempfile
+import warnings
+from array import array
+
+MAGIC = b"USERCOL1"
+HEADER = struct.Struct("<8sQQ")
+ENTRY = struct.Struct("<16sQQQQ")
+INT64, STRING = 0, 1
+
+SCHEMA = (("user_id", STRING), ("name", STRING), ("email", STRING), ("age", INT64))
+
+if sys.byteorder != "little":
+    raise ImportError("columnar_export assumes a little-endian platform")
+
+
+def _pad(file):
+    remainder = file.tell() % 8
+    if remainder:
+        file.write(b"\0" * (8 - remainder))
+
+
+def export_users(path, db_name="users.db", batch_size=10000):
+    """
+    Writes user_data to path in the columnar layout. Column data is spooled
+    to temporary files batch by batch, so memory use does not grow with the
+    table. Returns the number of rows written.
+
+    The layout has no null bitmap, so a NULL in any column raises ValueError
+    (the user_data schema declares every column NOT NULL).
+    """
+    data = [tempfile.TemporaryFile() for _ in SCHEMA]
+    offsets = [tempfile.TemporaryFile() if kind == STRING else None for _, kind in SCHEMA]
+    positions = [0] * len(SCHEMA)
+    for spool in offsets:
+        if spool is not None:
+            array("Q", [0]).tofile(spool)
+
+    rows = 0
+    conn = sqlite3.connect(db_name)
+    try:
+        cursor = conn.execute("SELECT user_id, name, email, age FROM user_data")
+        while True:
+            batch = cursor.fetchmany(batch_size)
+            if not batch:
+                break
+            for i, (name, kind) in enumerate(SCHEMA):
+                values = [row[i] for row in batch]
+                if None in values:
+                    raise ValueError(
+                        f"user_data.{name} is NULL in row {rows + values.index(None)}; "
+                        "the columnar layout cannot store NULLs"
+                    )
+                if kind == INT64:
+                    array("q", (int(v) for v in values)).tofile(data[i])
+                    continue
+                ends = array("Q")
+                chunk = []
+                for value in values:
+                    encoded = value.encode("utf-8")
+                    chunk.append(encoded)
+                    positions[i] += len(encoded)
+                    ends.append(positions[i])
+                data[i].write(b"".join(chunk))
+                ends.tofile(offsets[i])
+            rows += len(batch)
+    except BaseException:
+        for spool in data + offsets:
+            if spool is not None:
+                spool.close()
+        raise
+    finally:
+        conn.close()
+
+    with open(path, "wb") as out:
+        out.write(HEADER.pack(MAGIC, rows, len(SCHEMA)))
+        directory_at = out.tell()
+        out.write(b"\0" * ENTRY.size * len(SCHEMA))
+        entries = []
+        for i, (name, kind) in enumerate(SCHEMA):
+            offsets_at = 0
+            if offsets[i] is not None:
+                _pad(out)
+                offsets_at = out.tell()
+                offsets[i].seek(0)
+                shutil.copyfileobj(offsets[i], out)
+                offsets[i].close()
+            _pad(out)
+            data_at = out.tell()
+            data[i].seek(0)
+            shutil.copyfileobj(data[i], out)
+            data[i].close()
+            entries.append(ENTRY.pack(name.encode(), kind, data_at, out.tell() - data_at, offsets_at))
+        out.seek(directory_at)
+        out.write(b"".join(entries))
+    return rows
+
+
+class StringColumn:
+    """Zero-copy view of a string column; values are decoded on access."""
+
+    def __init__(self, offsets, data):
+        self.offsets = offsets
+        self.data = data
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def raw(self, index):
+        """Returns the undecoded bytes of one value as a memoryview."""
+        if index < 0:
+            index += len(self)
+        return self.data[self.offsets[index]:self.offsets[index + 1]]
+
+    def __getitem__(self, index):
+        return str(self.raw(index), "utf-8")
+
+    def __iter__(self):
+        data = self.data
+        start = 0
+        for end in self.offsets[1:]:
+            yield str(data[start:end], "utf-8")
+            start = end
+
+
+class ColumnarFile:
+    """
+    Memory-mapped reader for files written by export_users.
+
+        with ColumnarFile("users.col") as users:
+            ages = users["age"]  # memoryview of int64, no copy
+
+    Column views are only valid until the file is closed. If the caller
+    still holds slices of them (or StringColumn.raw() views) at close, the
+    mapping cannot be unmapped yet; it is then left to be freed once those
+    views are garbage collected, and the file itself is closed regardless.
+    """
+
+    def __init__(self, path):
+        self._file = open(path, "rb")
+        self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        self._view = memoryview(self._map)
+        self._exported = []
+        magic, self.rows, count = HEADER.unpack_from(self._map, 0)
+        if magic != MAGIC:
+            raise ValueError(f"{path} is not a user_data columnar file")
+        self.columns = {}
+        for i in range(count):
+            name, kind, data_at, length, offsets_at = ENTRY.unpack_from(
+                self._map, HEADER.size + i * ENTRY.size
+            )
+            self.columns[name.rstrip(b"\0").decode()] = (kind, data_at, length, offsets_at)
+
+    def __getitem__(self, name):
+        kind, data_at, length, offsets_at = self.columns[name]
+        data = self._view[data_at:data_at + length]
+        if kind == INT64:
+            column = data.cast("q")
+            self._exported += [data, column]
+            return column
+        offsets = self._view[offsets_at:offsets_at + 8 * (self.rows + 1)]
+        column = StringColumn(offsets.cast("Q"), data)
+        self._exported += [data, offsets, column.offsets]
+        return column
+
+    def __len__(self):
+        return self.rows
+
+    def close(self):
+        if self._file.closed:
+            return
+        try:
+            # Column views point into the map, so they are invalidated here
+            for view in reversed(self._exported + [self._view]):
+                try:
+                    view.release()
+                except BufferError:
+                    pass
+            self._exported = []
+            try:
+                self._map.close()
+            except BufferError:
+                warnings.warn(
+                    "ColumnarFile closed while views of it are still held; "
+                    "the mapping is freed when they are garbage collected",
+                    ResourceWarning, stacklevel=2,
+                )
+        finally:
+            self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+
+if __name__ == "__main__":
+    count = export_users("users.col")
+    print(f"Exported {count} rows to users.col")
+    with ColumnarFile("users.col") as users:
+        ages = users["age"]
+        print(f"Average age of users: {sum(ages) / len(ages) if len(ages) else 0}")
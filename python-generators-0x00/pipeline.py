@@ -0,0 +1,123 @@
+#!/usr/bin/python3
+"""
+Composable query pipeline over the user_data table.
+
+    UserQuery().where(age__gt=25).select("email").stream()
+
+is compiled to "SELECT email FROM user_data WHERE age > ?" so filtering and
+projection happen in the database instead of in Python.
+"""
+import sqlite3
+
+COLUMNS = ("user_id", "name", "email", "age")
+
+OPERATORS = {
+    "eq": "=",
+    "ne": "!=",
+    "gt": ">",
+    "gte": ">=",
+    "lt": "<",
+    "lte": "<=",
+    "in": "IN",
+}
+
+
+class UserQuery:
+    def __init__(self, connect=None, placeholder="?", columns=COLUMNS, filters=()):
+        self.connect = connect or (lambda: sqlite3.connect("users.db"))
+        self.placeholder = placeholder
+        self.columns = tuple(columns)
+        self.filters = tuple(filters)
+
+    @classmethod
+    def mysql(cls):
+        """Builds a query bound to the MySQL ALX_prodev database."""
+        seed = __import__('seed')
+        return cls(connect=seed.connect_to_prodev, placeholder="%s")
+
+    def _clone(self, **changes):
+        state = {
+            "connect": self.connect,
+            "placeholder": self.placeholder,
+            "columns": self.columns,
+            "filters": self.filters,
+        }
+        state.update(changes)
+        return UserQuery(**state)
+
+    def where(self, **lookups):
+        """
+        Adds filters in column__op=value form, e.g. age__gt=25.
+        A bare column name means equality.
+        """
+        filters = list(self.filters)
+        for lookup, value in lookups.items():
+            column, _, op = lookup.partition("__")
+            op = op or "eq"
+            _check_column(column)
+            if op not in OPERATORS:
+                raise ValueError(f"Unsupported lookup: {lookup}")
+            filters.append((column, op, value))
+        return self._clone(filters=filters)
+
+    def select(self, *columns):
+        """Restricts the columns fetched from the database."""
+        for column in columns:
+            _check_column(column)
+        return self._clone(columns=columns or COLUMNS)
+
+    def compile(self):
+        """Returns the (sql, params) pair for this query."""
+        sql = f"SELECT {', '.join(self.columns)} FROM user_data"
+        clauses = []
+        params = []
+        for column, op, value in self.filters:
+            if op == "in":
+                values = list(value)
+                if not values:
+                    clauses.append("1 = 0")
+                    continue
+                marks = ", ".join([self.placeholder] * len(values))
+                clauses.append(f"{column} IN ({marks})")
+                params.extend(values)
+            else:
+                clauses.append(f"{column} {OPERATORS[op]} {self.placeholder}")
+                params.append(value)
+        if clauses:
+            sql += " WHERE " + " AND ".join(clauses)
+        return sql, tuple(params)
+
+    def stream(self, arraysize=1000):
+        """Yields matching users one at a time as dictionaries."""
+        for page in self.paginate(arraysize):
+            yield from page
+
+    def paginate(self, page_size):
+        """Yields matching users in lists of up to page_size dictionaries."""
+        sql, params = self.compile()
+        connection = self.connect()
+        if connection is None:
+            return
+        cursor = connection.cursor()
+        try:
+            cursor.execute(sql, params)
+            while True:
+                rows = cursor.fetchmany(page_size)
+                if not rows:
+                    break
+                yield [dict(zip(self.columns, row)) for row in rows]
+        finally:
+            connection.close()
+
+    def __iter__(self):
+        return self.stream()
+
+
+def _check_column(column):
+    if column not in COLUMNS:
+        raise ValueError(f"Unknown user_data column: {column}")
+
+
+if __name__ == "__main__":
+    for user in UserQuery().where(age__gt=25).select("email"):
+        print(user)
@@ -1,6 +1,7 @@
 import mysql.connector
 from mysql.connector import errorcode
 import csv
+import time
 import uuid
 
 def connect_db():
@@ -25,14 +26,15 @@ def create_database(connection):
     except mysql.connector.Error as err:
         print(f"Database creation failed: {err}")
 
-def connect_to_prodev():
+def connect_to_prodev(allow_local_infile=False):
     """Connect to the ALX_prodev database"""
     try:
         return mysql.connector.connect(
             host="localhost",
             user="root",
             password="your_password",
-            database="ALX_prodev"
+            database="ALX_prodev",
+            allow_local_infile=allow_local_infile
         )
     except mysql.connector.Error as err:
         print(f"Error connecting to ALX_prodev: {err}")
@@ -48,7 +50,8 @@ def create_table(connection):
             name VARCHAR(255) NOT NULL,
             email VARCHAR(255) NOT NULL,
             age DECIMAL NOT NULL,
-            INDEX(user_id)
+            INDEX(user_id),
+            UNIQUE KEY uq_user_data_email (email)
         )
         """
         cursor.execute(query)
@@ -58,28 +61,102 @@ def create_table(connection):
     except mysql.connector.Error as err:
         print(f"Error creating table: {err}")
 
-def insert_data(connection, file_path):
-    """Insert CSV data into the table"""
+def ensure_email_index(connection):
+    """Add the unique email index to tables created before it existed"""
     try:
         cursor = connection.cursor()
-        with open(file_path, mode='r', encoding='utf-8') as file:
-            reader = csv.DictReader(file)
-            for row in reader:
-                user_id = str(uuid.uuid4())
-                name = row['name']
-                email = row['email']
-                age = row['age']
+        cursor.execute(
+            "SHOW INDEX FROM user_data WHERE Key_name = 'uq_user_data_email'"
+        )
+        if not cursor.fetchall():
+            cursor.execute(
+                "ALTER TABLE user_data ADD UNIQUE KEY uq_user_data_email (email)"
+            )
+        cursor.close()
+        return True
+    except mysql.connector.Error as err:
+        print(f"Error creating email index: {err}")
+        return False
 
-                # Check if this user email already exists
-                cursor.execute("SELECT * FROM user_data WHERE email = %s", (email,))
-                exists = cursor.fetchone()
-                if not exists:
-                    cursor.execute("""
-                        INSERT INTO user_data (user_id, name, email, age)
-                        VALUES (%s, %s, %s, %s)
-                    """, (user_id, name, email, age))
-        connection.commit()
-        print("Data inserted successfully")
+def read_csv_chunks(file_path, chunk_size):
+    """Yield lists of (user_id, name, email, age) rows, skipping repeated emails"""
+    seen = set()
+    chunk = []
+    with open(file_path, mode='r', encoding='utf-8', newline='') as file:
+        for row in csv.DictReader(file):
+            email = row['email']
+            if email in seen:
+                continue
+            seen.add(email)
+            chunk.append((str(uuid.uuid4()), row['name'], email, row['age']))
+            if len(chunk) >= chunk_size:
+                yield chunk
+                chunk = []
+    if chunk:
+        yield chunk
+
+def bulk_insert_data(connection, file_path, chunk_size=5000):
+    """
+    Insert CSV data in chunks with executemany and INSERT IGNORE.
+    Duplicates are dropped in memory within the file and by the unique
+    email index against rows already in the table.
+    Returns the number of rows inserted.
+    """
+    if not ensure_email_index(connection):
+        print("Warning: without the email index, duplicates already in the table are not skipped")
+    start = time.perf_counter()
+    inserted = 0
+    try:
+        cursor = connection.cursor()
+        for chunk in read_csv_chunks(file_path, chunk_size):
+            cursor.executemany("""
+                INSERT IGNORE INTO user_data (user_id, name, email, age)
+                VALUES (%s, %s, %s, %s)
+            """, chunk)
+            inserted += cursor.rowcount
+            connection.commit()
         cursor.close()
     except Exception as err:
+        connection.rollback()
         print(f"Error inserting data: {err}")
+        return None
+    _report(inserted, start)
+    return inserted
+
+def load_data_infile(connection, file_path):
+    """
+    Insert CSV data server-side with LOAD DATA LOCAL INFILE.
+    The connection must come from connect_to_prodev(allow_local_infile=True).
+    Returns the number of rows inserted.
+    """
+    ensure_email_index(connection)
+    start = time.perf_counter()
+    inserted = 0
+    try:
+        cursor = connection.cursor()
+        cursor.execute("""
+            LOAD DATA LOCAL INFILE %s IGNORE INTO TABLE user_data
+            FIELDS TERMINATED BY ',' OPTIONALLY ENCLOSED BY '"'
+            IGNORE 1 LINES
+            (name, email, age)
+            SET user_id = UUID()
+        """, (file_path,))
+        inserted = cursor.rowcount
+        connection.commit()
+        cursor.close()
+    except mysql.connector.Error as err:
+        connection.rollback()
+        print(f"Error loading data: {err}")
+        return None
+    _report(inserted, start)
+    return inserted
+
+def _report(rows, start):
+    elapsed = time.perf_counter() - start
+    rate = rows / elapsed if elapsed > 0 else 0
+    print(f"Inserted {rows} rows in {elapsed:.2f}s ({rate:.0f} rows/sec)")
+
+def insert_data(connection, file_path):
+    """Insert CSV data into the table"""
+    if bulk_insert_data(connection, file_path) is not None:
+        print("Data inserted successfully")
@@ -13,6 +13,9 @@ CREATE TABLE IF NOT EXISTS user_data (
 )
 """)
 
+# Index used by sharded_scan's user_id ranges (WHERE user_id >= ? AND user_id < ?)
+cursor.execute("CREATE INDEX IF NOT EXISTS idx_user_data_user_id ON user_data (user_id)")
+
 # Sample data
 sample_users = [
     ("00234e50-34eb-4ce2-94ec-26e3fa749796", "Dan Altenwerth Jr.", "Molly59@gmail.com", 67),
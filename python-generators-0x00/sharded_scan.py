@@ -0,0 +1,133 @@
+#!/usr/bin/python3
+"""
+Parallel scan of user_data split into user_id key ranges.
+
+Each range is streamed by its own worker process, with an optional per-row
+transform applied in the worker, and the batches are merged back into one
+generator in the parent.
+"""
+import multiprocessing
+import os
+import sqlite3
+
+DB_NAME = "users.db"
+
+
+def shard_bounds(num_shards, db_name=DB_NAME):
+    """
+    Splits user_data into num_shards contiguous user_id ranges of roughly
+    equal size. Returns a list of (low, high) pairs where None means
+    unbounded; low is inclusive and high is exclusive.
+    """
+    conn = sqlite3.connect(db_name)
+    try:
+        (total,) = conn.execute("SELECT COUNT(*) FROM user_data").fetchone()
+        num_shards = max(1, min(num_shards, total))
+        splits = []
+        for i in range(1, num_shards):
+            row = conn.execute(
+                "SELECT user_id FROM user_data ORDER BY user_id LIMIT 1 OFFSET ?",
+                (total * i // num_shards,)
+            ).fetchone()
+            if row and (not splits or row[0] != splits[-1]):
+                splits.append(row[0])
+    finally:
+        conn.close()
+
+    edges = [None] + splits + [None]
+    return list(zip(edges, edges[1:]))
+
+
+def _scan_range(index, low, high, batch_size, transform, queue, db_name):
+    """Worker body: streams one key range onto the result queue."""
+    try:
+        conn = sqlite3.connect(db_name)
+        try:
+            clauses = []
+            params = []
+            if low is not None:
+                clauses.append("user_id >= ?")
+                params.append(low)
+            if high is not None:
+                clauses.append("user_id < ?")
+                params.append(high)
+            query = "SELECT user_id, name, email, age FROM user_data"
+            if clauses:
+                query += " WHERE " + " AND ".join(clauses)
+            query += " ORDER BY user_id"
+
+            cursor = conn.execute(query, params)
+            while True:
+                rows = cursor.fetchmany(batch_size)
+                if not rows:
+                    break
+                if transform is not None:
+                    rows = [transform(row) for row in rows]
+                queue.put((index, rows))
+        finally:
+            conn.close()
+        queue.put((index, None))
+    except Exception as e:
+        queue.put((index, e))
+
+
+def sharded_scan(num_workers=None, batch_size=1000, transform=None, ordered=False, db_name=DB_NAME):
+    """
+    Streams every row of user_data using num_workers processes.
+
+    transform, if given, must be a picklable top-level function; it is
+    applied to each row inside the workers. With ordered=True rows come back
+    in user_id order and each worker buffers at most four batches ahead of
+    the consumer; otherwise batches are yielded as soon as any worker
+    produces them.
+    """
+    bounds = shard_bounds(num_workers or os.cpu_count() or 1, db_name)
+    if ordered:
+        # One small queue per shard, drained in key order: a worker that is
+        # ahead of the consumer blocks on its own full queue instead of its
+        # batches piling up in the parent
+        queues = [multiprocessing.Queue(maxsize=4) for _ in bounds]
+    else:
+        # Bounded queue so fast workers cannot run far ahead of the consumer
+        queues = [multiprocessing.Queue(maxsize=len(bounds) * 4)] * len(bounds)
+    workers = [
+        multiprocessing.Process(
+            target=_scan_range,
+            args=(i, low, high, batch_size, transform, queues[i], db_name),
+            daemon=True
+        )
+        for i, (low, high) in enumerate(bounds)
+    ]
+    for worker in workers:
+        worker.start()
+
+    try:
+        if ordered:
+            for queue in queues:
+                while True:
+                    _, batch = queue.get()
+                    if isinstance(batch, Exception):
+                        raise batch
+                    if batch is None:
+                        break
+                    yield from batch
+        else:
+            done = 0
+            while done < len(workers):
+                _, batch = queues[0].get()
+                if isinstance(batch, Exception):
+                    raise batch
+                if batch is None:
+                    done += 1
+                else:
+                    yield from batch
+    finally:
+        for worker in workers:
+            if worker.is_alive():
+                worker.terminate()
+            worker.join()
+
+
+if __name__ == "__main__":
+    for row in sharded_scan(ordered=True):
+        print(row)